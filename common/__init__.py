@@ -0,0 +1 @@
+"""Общий код приложений, подключаемых в app.py."""
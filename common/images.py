@@ -0,0 +1,131 @@
+import hashlib
+import mimetypes
+import os
+import tempfile
+from threading import Lock
+
+from flask import abort, current_app, request, send_from_directory
+from PIL import Image as PILImage, ImageOps
+from werkzeug.security import safe_join
+
+# Имена загруженных файлов не переиспользуются, поэтому их можно кэшировать "навсегда"
+IMAGE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Разрешённые размеры и форматы миниатюр: произвольные значения из запроса
+# позволили бы заполнить дисковый кэш бесконечным числом вариантов
+THUMBNAIL_SIZES = {(160, 160), (340, 340), (640, 360), (960, 540)}
+THUMBNAIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG', 'png': 'PNG'}
+DEFAULT_THUMBNAIL_CACHE_SIZE = 512 * 1024 * 1024
+
+_eviction_lock = Lock()
+
+def send_image(directory: str, filename: str, etag: str):
+    """Отдать неизменяемое изображение с долгим кэшированием.
+
+    Ответ содержит сильный ETag, Last-Modified и Cache-Control: immutable,
+    условные запросы (If-None-Match/If-Modified-Since) получают 304,
+    поддерживаются Range-запросы. Если задан IMAGE_X_ACCEL_PREFIX, байты
+    отдаёт nginx через X-Accel-Redirect; для Apache/lighttpd достаточно
+    стандартного параметра Flask USE_X_SENDFILE.
+    """
+    x_accel_prefix = current_app.config.get('IMAGE_X_ACCEL_PREFIX')
+    if not x_accel_prefix:
+        return _send_immutable(directory, filename, etag)
+
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    response = current_app.response_class()
+    response.headers['X-Accel-Redirect'] = f"{x_accel_prefix.rstrip('/')}/{filename}"
+    response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response.set_etag(etag)
+    response.last_modified = os.path.getmtime(path)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMAGE_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+def _send_immutable(directory: str, filename: str, etag: str):
+    response = send_from_directory(directory, filename, etag=etag,
+                                   max_age=IMAGE_MAX_AGE, conditional=True)
+    response.cache_control.immutable = True
+    return response
+
+def _thumbnail_folder() -> str:
+    return current_app.config.get('THUMBNAIL_FOLDER') or \
+        current_app.config['UPLOAD_FOLDER'].rstrip(os.sep) + '_thumbnails'
+
+def send_thumbnail(directory: str, filename: str, etag: str, width: int, height: int, fmt: str):
+    """Отдать уменьшенную копию изображения из дискового кэша.
+
+    Миниатюра создаётся при первом запросе и хранится в THUMBNAIL_FOLDER
+    (по умолчанию рядом с UPLOAD_FOLDER) в подкаталогах по первым символам
+    хэша имени. Время изменения файла обновляется при каждом обращении,
+    и при превышении THUMBNAIL_CACHE_SIZE удаляются давно не запрошенные.
+    """
+    if (width, height) not in THUMBNAIL_SIZES or fmt not in THUMBNAIL_FORMATS:
+        abort(404)
+    source = safe_join(directory, filename)
+    if source is None or not os.path.isfile(source):
+        abort(404)
+
+    variant = f'{etag}-{width}x{height}'
+    name = f'{variant}.{fmt}'
+    shard = hashlib.sha1(name.encode('utf-8')).hexdigest()[:2]
+    cache_dir = os.path.join(_thumbnail_folder(), shard)
+    path = os.path.join(cache_dir, name)
+    if os.path.isfile(path):
+        os.utime(path)
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        _render_thumbnail(source, path, (width, height), THUMBNAIL_FORMATS[fmt])
+        _evict_thumbnails(current_app.config.get('THUMBNAIL_CACHE_SIZE', DEFAULT_THUMBNAIL_CACHE_SIZE),
+                          keep=path)
+    # Миниатюры невелики и лежат вне UPLOAD_FOLDER, поэтому отдаются без X-Accel-Redirect
+    return _send_immutable(cache_dir, name, etag=f'{variant}-{fmt}')
+
+def _render_thumbnail(source: str, path: str, size: tuple, pil_format: str) -> None:
+    with PILImage.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(size)
+        if pil_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.thumbnail-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                img.save(tmp, pil_format)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+def _evict_thumbnails(max_size: int, keep: str) -> None:
+    """Удалить давно не запрошенные миниатюры, пока кэш не станет меньше max_size.
+
+    Только что созданная миниатюра keep не удаляется, даже если одна превышает лимит.
+    """
+    with _eviction_lock:
+        entries = []
+        total = 0
+        for root, _, files in os.walk(_thumbnail_folder()):
+            for file in files:
+                path = os.path.join(root, file)
+                if path == keep:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= max_size:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= max_size:
+                break
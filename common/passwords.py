@@ -0,0 +1,108 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Строка метода werkzeug: 'scrypt:N:r:p' или 'pbkdf2:<хэш>:<итерации>'
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_SALT_LENGTH = 16
+
+# Префиксы хэшей по методам: считаются один раз на процесс
+_prefixes = {}
+
+class HasherBusyError(Exception):
+    pass
+
+class PasswordHasher:
+    """Хэширование паролей настраиваемым методом werkzeug в ограниченном пуле потоков.
+
+    Хэширование намеренно дорогое по CPU, поэтому одновременно выполняется не
+    больше PASSWORD_HASH_WORKERS хэшей (функции хэширования отпускают GIL) и
+    не больше PASSWORD_HASH_QUEUE_SIZE ждут свободного потока; если место не
+    освободилось за PASSWORD_HASH_TIMEOUT секунд, выбрасывается HasherBusyError,
+    а поток запроса не простаивает. При PASSWORD_HASH_WORKERS = 0 хэш
+    считается прямо в потоке запроса.
+
+    Хэши с другими параметрами по-прежнему проверяются, а needs_rehash
+    сообщает о них, чтобы обновить хэш при следующем входе. Каждое приложение
+    создаёт свой экземпляр: в общем процессе (app.py) у них разные настройки.
+    """
+
+    def __init__(self, app=None):
+        self.method = DEFAULT_METHOD
+        self.salt_length = DEFAULT_SALT_LENGTH
+        self.workers = os.cpu_count() or 1
+        self.queue_size = self.workers * 4
+        self.timeout = 10
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+        self.salt_length = app.config.get('PASSWORD_HASH_SALT_LENGTH', DEFAULT_SALT_LENGTH)
+        workers = app.config.get('PASSWORD_HASH_WORKERS')
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.queue_size = app.config.get('PASSWORD_HASH_QUEUE_SIZE', self.workers * 4)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        self.shutdown()
+
+    @property
+    def prefix(self):
+        # werkzeug дополняет метод параметрами ('scrypt' -> 'scrypt:32768:8:1'),
+        # поэтому префикс берётся из настоящего хэша; заодно сразу видна ошибка в методе
+        if self.method not in _prefixes:
+            _prefixes[self.method] = generate_password_hash('', self.method).split('$', 1)[0]
+        return _prefixes[self.method]
+
+    def _get_executor(self):
+        with self._lock:
+            # Потоки не переживают fork(): у каждого рабочего процесса свой пул
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hasher')
+                self._slots = BoundedSemaphore(self.workers + self.queue_size)
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        executor, slots = self._get_executor()
+        if not slots.acquire(timeout=self.timeout):
+            raise HasherBusyError('Слишком много одновременных проверок паролей')
+        try:
+            future = executor.submit(func, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future.result()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=False)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        if not password_hash or password is None:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.prefix
+
+    def verify_and_update(self, password_hash, password):
+        """Вернуть (пароль верен, новый хэш); новый хэш задан, если сохранённый устарел."""
+        if not self.verify(password_hash, password):
+            return False, None
+        if self.needs_rehash(password_hash):
+            return True, self.hash(password)
+        return True, None
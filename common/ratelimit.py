@@ -0,0 +1,157 @@
+import math
+import os
+import sqlite3
+import time
+from threading import Lock, local
+
+PRUNE_EVERY = 1000
+
+def take_token(tokens, updated_at, now, capacity, refill_rate):
+    """Пополнить корзину токенов к моменту now и попытаться взять один токен.
+
+    Возвращает (осталось токенов, retry_after); retry_after равен 0, если токен взят.
+    """
+    tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / refill_rate
+
+def full_at(tokens, now, capacity, refill_rate):
+    # После этого момента корзина неотличима от отсутствующей
+    return now + (capacity - tokens) / refill_rate
+
+class MemoryBucketStore:
+    """Корзины токенов в словаре, общем для потоков одного процесса."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = Lock()
+        self._operations = 0
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (capacity, now, now))
+            tokens, retry_after = take_token(tokens, updated_at, now, capacity, refill_rate)
+            self._buckets[key] = (tokens, now, full_at(tokens, now, capacity, refill_rate))
+            self._operations += 1
+            if self._operations % PRUNE_EVERY == 0:
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+        return retry_after
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+class SQLiteBucketStore:
+    """Корзины токенов в файле SQLite, общем для всех рабочих процессов на сервере.
+
+    Каждое обновление выполняется в транзакции BEGIN IMMEDIATE: параллельные
+    процессы ждут блокировку файла, а не затирают счётчики друг друга.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = local()
+        self._operations = 0
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS login_buckets ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+                'updated_at REAL NOT NULL, full_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        # Соединение sqlite3 нельзя передавать между потоками и через fork()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        # Время по часам: monotonic в разных процессах несравнимо
+        now = time.time() if now is None else now
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT tokens, updated_at FROM login_buckets WHERE key = ?', (key,)
+            ).fetchone()
+            tokens, updated_at = row if row is not None else (capacity, now)
+            tokens, retry_after = take_token(tokens, updated_at, now, capacity, refill_rate)
+            connection.execute(
+                'INSERT OR REPLACE INTO login_buckets (key, tokens, updated_at, full_at) '
+                'VALUES (?, ?, ?, ?)',
+                (key, tokens, now, full_at(tokens, now, capacity, refill_rate))
+            )
+            self._operations += 1
+            if self._operations % PRUNE_EVERY == 0:
+                connection.execute('DELETE FROM login_buckets WHERE full_at <= ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return retry_after
+
+    def reset(self, key):
+        self._connect().execute('DELETE FROM login_buckets WHERE key = ?', (key,))
+
+def create_store(storage):
+    """Создать хранилище корзин по LOGIN_THROTTLE_STORAGE.
+
+    'memory' хранит корзины в процессе, 'sqlite:///<путь>' делит их между
+    процессами через файл; объект с методами consume() и reset() используется как есть.
+    """
+    if not isinstance(storage, str):
+        return storage
+    if storage == 'memory':
+        return MemoryBucketStore()
+    if storage.startswith('sqlite:///'):
+        return SQLiteBucketStore(storage[len('sqlite:///'):])
+    raise ValueError(f'Неизвестное хранилище LOGIN_THROTTLE_STORAGE: {storage!r}')
+
+class LoginThrottle:
+    """Ограничение попыток входа корзинами токенов по IP клиента и по логину.
+
+    Каждый POST входа берёт токен из обеих корзин до обращения к БД и
+    вычисления хэша пароля. Корзина вмещает до *_CAPACITY попыток и
+    восстанавливает *_PER_MINUTE из них в минуту; успешный вход заново
+    наполняет корзину этого логина.
+
+    Каждое приложение создаёт свой экземпляр и настраивает его в init_app.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('LOGIN_THROTTLE_ENABLED', True)
+        self.ip_capacity = app.config.get('LOGIN_THROTTLE_IP_CAPACITY', 30)
+        self.ip_refill_rate = app.config.get('LOGIN_THROTTLE_IP_PER_MINUTE', 10) / 60
+        self.login_capacity = app.config.get('LOGIN_THROTTLE_LOGIN_CAPACITY', 5)
+        self.login_refill_rate = app.config.get('LOGIN_THROTTLE_LOGIN_PER_MINUTE', 1) / 60
+        self.store = create_store(app.config.get('LOGIN_THROTTLE_STORAGE', 'memory'))
+
+    @staticmethod
+    def _login_key(login):
+        return 'login:' + (login or '').strip().lower()
+
+    def hit(self, ip, login):
+        """Учесть попытку входа; вернуть, сколько секунд ждать, или 0, если вход разрешён."""
+        if not self.enabled:
+            return 0
+        retry_after = self.store.consume(f'ip:{ip}', self.ip_capacity, self.ip_refill_rate)
+        if not retry_after:
+            retry_after = self.store.consume(self._login_key(login), self.login_capacity,
+                                             self.login_refill_rate)
+        return math.ceil(retry_after)
+
+    def reset(self, login):
+        if self.enabled:
+            self.store.reset(self._login_key(login))
@@ -1,13 +1,26 @@
+import os
+import sys
+
+# Общий пакет common лежит в корне репозитория. При запуске из каталога
+# приложения (flask --app app ..., скрипты, тесты) корня в sys.path нет;
+# добавляется в конец, чтобы корневой app.py не заслонил этот пакет app
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
 from flask import Flask, send_from_directory
 from flask_migrate import Migrate
 from flask_login import current_user
 from sqlalchemy.exc import SQLAlchemyError
-import os
 
 from .models import db
-from .auth import bp as auth_bp, init_login_manager, user_allowed
+from .passwords import hasher
+from .ratelimit import login_throttle
+from .auth import bp as auth_bp, init_login_manager, user_allowed, log_policy_cache_stats
 from .routes import bp as main_bp
-from .events_old import bp as events_bp
+from .query_counter import init_query_counter
+from .uploads import init_uploads
+from .events import bp as events_bp
 
 def handle_sqlalchemy_error(err):
     error_msg = ('Возникла ошибка при подключении к базе данных. '
@@ -22,12 +35,17 @@ def create_app(test_config=None):
         app.config.from_mapping(test_config)
 
     db.init_app(app)
+    hasher.init_app(app)
+    login_throttle.init_app(app)
     migrate = Migrate(app, db)
 
     init_login_manager(app)
+    init_query_counter(app)
+    init_uploads(app)
 
     app.jinja_env.globals['current_user'] = current_user
     app.jinja_env.globals['user_allowed'] = user_allowed
+    app.after_request(log_policy_cache_stats)
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
@@ -1,10 +1,12 @@
-from flask import Blueprint, request, render_template, url_for, flash, redirect, session
+from flask import Blueprint, request, render_template, url_for, flash, redirect, session, g, current_app
 from flask_login import LoginManager, current_user, login_user, logout_user, login_required
 from functools import wraps
 
 from .policies.events_policy import EventsPolicy
 
 from ..repositories import get_repository
+from ..passwords import HasherBusyError
+from ..ratelimit import login_throttle
 
 policies = {
     'events': EventsPolicy,
@@ -23,16 +25,29 @@ def init_login_manager(app):
     login_manager.init_app(app)
 
 def load_user(user_id):
-    return user_repository.get_user_by_id(user_id)
+    return user_repository.get_user_with_role(int(user_id),
+                                              cache_ttl=current_app.config.get('USER_CACHE_TTL'))
 
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         login = request.form.get('login')
         password = request.form.get('password')
+        retry_after = login_throttle.hit(request.remote_addr, login)
+        if retry_after:
+            flash(f'Слишком много попыток входа, повторите через {retry_after} с.', 'danger')
+            return render_template('auth/login.html'), 429, {'Retry-After': str(retry_after)}
         if login and password:
             user = user_repository.get_user_by_login(login)
-            if user and user.check_password(password):
+            try:
+                is_valid = user is not None and user.check_password(password)
+            except HasherBusyError:
+                flash('Сервер перегружен, попробуйте войти позже.', 'danger')
+                return render_template('auth/login.html'), 503
+            if is_valid:
+                login_throttle.reset(login)
+                # check_password мог обновить устаревший хэш пароля
+                user_repository.save()
                 login_user(user)
                 flash('Вы успешно аутентифицированы.', 'success')
                 next = request.args.get('next')
@@ -49,8 +64,26 @@ def logout():
     return redirect(url_for('main.index'))
 
 def user_allowed(resource, action, **kwargs):
+    # Решения политик кэшируются на время запроса: шаблоны вызывают
+    # user_allowed для каждой строки таблицы с одними и теми же аргументами
+    user_id = current_user.get_id() if current_user.is_authenticated else None
+    key = (resource, action, tuple(sorted(kwargs.items())), user_id)
+    decisions = g.setdefault('policy_decisions', {})
+    if key in decisions:
+        g.policy_cache_hits = g.get('policy_cache_hits', 0) + 1
+        return decisions[key]
+    g.policy_cache_misses = g.get('policy_cache_misses', 0) + 1
     policy = policies[resource](**kwargs)
-    return getattr(policy, action, lambda: False)()
+    decisions[key] = getattr(policy, action, lambda: False)()
+    return decisions[key]
+
+def log_policy_cache_stats(response):
+    hits = g.get('policy_cache_hits', 0)
+    misses = g.get('policy_cache_misses', 0)
+    if hits or misses:
+        current_app.logger.info('%s %s: кэш политик доступа - %d попаданий, %d промахов',
+                                request.method, request.path, hits, misses)
+    return response
 
 def check_rights(resource, action):
     def decorator(function):
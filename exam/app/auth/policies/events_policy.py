@@ -15,3 +15,7 @@ class EventsPolicy(BasePolicy):
     @authentication_required
     def create(self):
         return self._allow_only('администратор')
+
+    @authentication_required
+    def moderate(self):
+        return self._allow_set(['модератор', 'администратор'])
@@ -0,0 +1,17 @@
+import hashlib
+
+import bleach
+import markdown
+
+ALLOWED_TAGS = ['p', 'br', 'strong', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+                'ul', 'ol', 'li', 'blockquote', 'a', 'code', 'pre']
+ALLOWED_ATTRIBUTES = {'a': ['href'], 'code': ['class']}
+
+def sanitize(text: str) -> str:
+    return bleach.clean(text, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def render(text: str) -> str:
+    return markdown.markdown(text)
@@ -1,14 +1,11 @@
-import os
-import uuid
-from werkzeug.utils import secure_filename
 from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, jsonify
 from flask_login import login_required, current_user
 from sqlalchemy.exc import IntegrityError
-import markdown
 
 from .repositories import get_repository
-from .auth import check_rights
+from .auth import check_rights, user_allowed
 from .models import RegistrationStatus
+from . import descriptions, uploads
 
 user_repository = get_repository('users')
 event_repository = get_repository('events')
@@ -25,7 +22,15 @@ def params():
 
 @bp.route('/')
 def index():
-    pagination, events = event_repository.get_upcoming_events()
+    if current_app.config.get('EVENTS_KEYSET_PAGINATION'):
+        pagination, events = event_repository.get_upcoming_events_keyset(
+            cursor=request.args.get('cursor'),
+            with_total=current_app.config.get('EVENTS_PAGINATION_TOTAL', True),
+            with_counts=True,
+            profile='listing'
+        )
+    else:
+        pagination, events = event_repository.get_upcoming_events(with_counts=True, profile='listing')
     return render_template('events/index.html',
                            pagination=pagination,
                            events=events)
@@ -42,34 +47,18 @@ def new():
 def create():
     f = request.files.get('image')
     img_filename = 'default.jpg'
+    img_hash = None
     event = None
     
     try:
         if f and f.filename:
-            allowed_extensions = {'png', 'jpg', 'jpeg', 'gif'}
-            if '.' in f.filename and f.filename.rsplit('.', 1)[1].lower() in allowed_extensions:
-                filename = secure_filename(f.filename)
-                unique_filename = f"{uuid.uuid4()}_{filename}"
-                
-                upload_dir = current_app.config['UPLOAD_FOLDER']
-                os.makedirs(upload_dir, exist_ok=True)
-                
-                file_path = os.path.join(upload_dir, unique_filename)
-                f.save(file_path)
-                img_filename = unique_filename
-            else:
-                flash('Недопустимый формат файла. Разрешены: PNG, JPG, JPEG, GIF', 'danger')
+            try:
+                img_filename, img_hash = uploads.save_image(f)
+            except uploads.UploadError as err:
+                flash(str(err), 'danger')
                 return render_template('events/new.html')
         
-        import bleach
-        allowed_tags = ['p', 'br', 'strong', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 
-                       'ul', 'ol', 'li', 'blockquote', 'a', 'code', 'pre']
-        allowed_attributes = {'a': ['href'], 'code': ['class']}
-        clean_description = bleach.clean(
-            request.form.get('description', ''), 
-            tags=allowed_tags, 
-            attributes=allowed_attributes
-        )
+        clean_description = descriptions.sanitize(request.form.get('description', ''))
         
         from datetime import datetime
         date_str = request.form.get('date')
@@ -82,6 +71,7 @@ def create():
             location=request.form.get('location'),
             volunteer_required=int(request.form.get('volunteer_required', 0)),
             image=img_filename,
+            image_hash=img_hash,
             organizer_id=current_user.id
         )
         
@@ -100,39 +90,34 @@ def create():
 @bp.route('/<int:event_id>/')
 @check_rights('events', 'show')
 def show(event_id):
-    event = event_repository.get_by_id(event_id)
+    # Списки заявок видят те, кто может их модерировать: для них заявки
+    # загружаются сразу вместе с волонтёрами, без запроса на каждую строку
+    can_moderate = current_user.is_authenticated and user_allowed('events', 'moderate')
+    event = event_repository.get_event(event_id, profile='moderation' if can_moderate else 'detail')
     if not event:
         flash('Такого мероприятия не существует', 'danger')
         return redirect(url_for('events.index'))
     
-    # Преобразуем Markdown в HTML
-    event.description_html = markdown.markdown(event.description)
+    # HTML описания берётся из кэша, старые записи дорендериваются
+    event_repository.ensure_description_html(event)
     
-    # Получаем регистрации
+    # Регистрации уже загружены вместе с мероприятием
     accepted_registrations = []
     pending_registrations = []
     user_registration = None
     
     if current_user.is_authenticated:
-        # Получаем регистрацию текущего пользователя
-        user_registration = registration_repository.get_user_event_registration(
-            current_user.id, event_id
+        user_registration = next(
+            (registration for registration in event.registrations
+             if registration.volunteer_id == current_user.id),
+            None
         )
         
-        # Получаем списки регистраций для админов и модераторов
-        if hasattr(current_user, 'role') and current_user.role.name in ['Администратор', 'Модератор']:
-            accepted_registrations = registration_repository.get_event_registrations(
-                event_id, RegistrationStatus.ACCEPTED
-            )
+        if can_moderate:
             # Сортируем по дате регистрации (по убыванию)
-            accepted_registrations.sort(key=lambda x: x.date, reverse=True)
-            
-            # Для модераторов - получаем ожидающие регистрации
-            if current_user.role.name == 'Модератор':
-                pending_registrations = registration_repository.get_event_registrations(
-                    event_id, RegistrationStatus.PENDING
-                )
-                pending_registrations.sort(key=lambda x: x.date, reverse=True)
+            registrations = sorted(event.registrations, key=lambda x: x.date, reverse=True)
+            accepted_registrations = [r for r in registrations if r.status == RegistrationStatus.accepted]
+            pending_registrations = [r for r in registrations if r.status == RegistrationStatus.pending]
     
     return render_template('events/show.html', 
                            event=event,
@@ -160,15 +145,7 @@ def update(event_id):
         return redirect(url_for('events.index'))
     
     try:
-        import bleach
-        allowed_tags = ['p', 'br', 'strong', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 
-                       'ul', 'ol', 'li', 'blockquote', 'a', 'code', 'pre']
-        allowed_attributes = {'a': ['href'], 'code': ['class']}
-        clean_description = bleach.clean(
-            request.form.get('description', ''), 
-            tags=allowed_tags, 
-            attributes=allowed_attributes
-        )
+        clean_description = descriptions.sanitize(request.form.get('description', ''))
         
         from datetime import datetime
         date_str = request.form.get('date')
@@ -252,35 +229,22 @@ def register(event_id):
 @check_rights('events', 'moderate')
 def approve_registration(event_id, volunteer_id):
     """Принятие заявки на регистрацию"""
-    registration = registration_repository.get_user_event_registration(volunteer_id, event_id)
-    if not registration:
-        flash('Регистрация не найдена', 'danger')
-        return redirect(url_for('events.show', event_id=event_id))
-    
     try:
-        # Принимаем заявку
-        registration_repository.update_registration_status(registration, RegistrationStatus.ACCEPTED)
-        
-        # Проверяем, не набралось ли достаточно волонтёров
-        event = event_repository.get_by_id(event_id)
-        accepted_count = registration_repository.get_accepted_registrations_count(event_id)
-        
-        if accepted_count >= event.volunteer_required:
-            # Отклоняем остальные ожидающие заявки
-            pending_registrations = registration_repository.get_event_registrations(
-                event_id, RegistrationStatus.PENDING
-            )
-            for pending_reg in pending_registrations:
-                registration_repository.update_registration_status(pending_reg, RegistrationStatus.REJECTED)
-            
-            flash(f'Заявка принята! Набор волонтёров завершён ({accepted_count}/{event.volunteer_required})', 'success')
-        else:
-            flash('Заявка принята!', 'success')
-            
+        result = registration_repository.approve_with_capacity(event_id, volunteer_id)
     except Exception as e:
-        registration_repository.rollback()
         flash('Произошла ошибка при обработке заявки', 'danger')
-    
+        return redirect(url_for('events.show', event_id=event_id))
+
+    if result is None:
+        flash('Мероприятие не найдено', 'danger')
+    elif not result.accepted and not result.is_full:
+        flash('Регистрация не найдена', 'danger')
+    elif not result.accepted:
+        flash(f'Набор волонтёров уже завершён ({result.accepted_count}/{result.volunteer_required})', 'warning')
+    elif result.is_full:
+        flash(f'Заявка принята! Набор волонтёров завершён ({result.accepted_count}/{result.volunteer_required})', 'success')
+    else:
+        flash('Заявка принята!', 'success')
     return redirect(url_for('events.show', event_id=event_id))
 
 @bp.route('/<int:event_id>/reject_registration/<int:volunteer_id>', methods=['POST'])
@@ -288,16 +252,47 @@ def approve_registration(event_id, volunteer_id):
 @check_rights('events', 'moderate')
 def reject_registration(event_id, volunteer_id):
     """Отклонение заявки на регистрацию"""
-    registration = registration_repository.get_user_event_registration(volunteer_id, event_id)
-    if not registration:
+    try:
+        result = registration_repository.moderate_registrations(
+            event_id, [volunteer_id], RegistrationStatus.rejected
+        )
+    except Exception as e:
+        flash('Произошла ошибка при обработке заявки', 'danger')
+        return redirect(url_for('events.show', event_id=event_id))
+
+    if result is None or not result.rejected:
         flash('Регистрация не найдена', 'danger')
+    else:
+        flash('Заявка отклонена', 'info')
+    return redirect(url_for('events.show', event_id=event_id))
+
+MODERATION_ACTIONS = {
+    'accept': RegistrationStatus.accepted,
+    'reject': RegistrationStatus.rejected,
+}
+
+@bp.route('/<int:event_id>/moderate_registrations', methods=['POST'])
+@login_required
+@check_rights('events', 'moderate')
+def moderate_registrations(event_id):
+    """Массовое принятие или отклонение заявок"""
+    status = MODERATION_ACTIONS.get(request.form.get('action'))
+    volunteer_ids = request.form.getlist('volunteer_ids', type=int)
+    if status is None or not volunteer_ids:
+        flash('Выберите заявки и действие', 'warning')
         return redirect(url_for('events.show', event_id=event_id))
-    
+
     try:
-        registration_repository.update_registration_status(registration, RegistrationStatus.REJECTED)
-        flash('Заявка отклонена', 'info')
+        result = registration_repository.moderate_registrations(event_id, volunteer_ids, status)
     except Exception as e:
-        registration_repository.rollback()
-        flash('Произошла ошибка при обработке заявки', 'danger')
-    
+        flash('Произошла ошибка при обработке заявок', 'danger')
+        return redirect(url_for('events.show', event_id=event_id))
+
+    if result is None:
+        flash('Мероприятие не найдено', 'danger')
+        return redirect(url_for('events.index'))
+    message = f'Принято заявок: {result.accepted}, отклонено: {result.rejected}.'
+    if result.is_full:
+        message += f' Набор волонтёров завершён ({result.accepted_count}/{result.volunteer_required})'
+    flash(message, 'success')
     return redirect(url_for('events.show', event_id=event_id))
@@ -1,12 +1,13 @@
 from typing import Optional, List
 from datetime import datetime
 import enum
-from werkzeug.security import check_password_hash, generate_password_hash
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey, Text, DateTime, MetaData, Enum
+from sqlalchemy.orm import Mapped, mapped_column, relationship, column_property
+from sqlalchemy import String, ForeignKey, Text, DateTime, MetaData, Enum, Index, inspect, select, func
+
+from .passwords import hasher
 
 class Base(DeclarativeBase):
   metadata = MetaData(naming_convention={
@@ -26,21 +27,33 @@ class RegistrationStatus(enum.Enum):
 
 class Event(Base):
     __tablename__ = 'events'
+    __table_args__ = (
+        Index('ix_events_date_id', 'date', 'id'),
+        Index('ix_events_organizer_id', 'organizer_id'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=False)
+    description_html: Mapped[Optional[str]] = mapped_column(Text, nullable=True, deferred=True)
+    description_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     date: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     location: Mapped[str] = mapped_column(String(120), nullable=False)
     volunteer_required: Mapped[int] = mapped_column(nullable=False)
     image: Mapped[str] = mapped_column(String(100), nullable=False)
+    image_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     organizer_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
 
     organizer: Mapped["User"] = relationship(back_populates="organized_events")
-    registrations: Mapped[List["Registration"]] = relationship(back_populates="event")
+    # Заявки удаляются вместе с мероприятием (в БД - ON DELETE CASCADE)
+    registrations: Mapped[List["Registration"]] = relationship(back_populates="event",
+                                                               cascade="all, delete-orphan")
 
     @property
     def volunteer_registered(self):
+        # Счётчик подгружается подзапросом в режиме подсчёта (см. EventRepository)
+        if 'accepted_count' not in inspect(self).unloaded:
+            return self.accepted_count
         accepted_registrations = list(filter(lambda registration: registration.status == RegistrationStatus.accepted, self.registrations))
         return len(accepted_registrations)
     
@@ -55,6 +68,10 @@ class Event(Base):
 
 class Registration(Base):
     __tablename__ = 'registrations'
+    __table_args__ = (
+        Index('ix_registrations_event_id_status', 'event_id', 'status'),
+        Index('ix_registrations_volunteer_id', 'volunteer_id'),
+    )
     
     event_id: Mapped[int] = mapped_column(
         ForeignKey("events.id", ondelete="CASCADE"), 
@@ -78,6 +95,15 @@ class Registration(Base):
     def __repr__(self):
         return f'<Registration {self.volunteer_id} -> {self.event_id} ({self.status.value})>'
 
+Event.accepted_count = column_property(
+    select(func.count())
+    .where(Registration.event_id == Event.id)
+    .where(Registration.status == RegistrationStatus.accepted)
+    .correlate_except(Registration)
+    .scalar_subquery(),
+    deferred=True
+)
+
 class User(Base, UserMixin):
     __tablename__ = 'users'
 
@@ -97,10 +123,14 @@ class User(Base, UserMixin):
     organized_events: Mapped[List["Event"]] = relationship(back_populates="organizer")
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # Устаревший хэш заменяется новым, сохранить его должен вызывающий код
+        is_valid, new_hash = hasher.verify_and_update(self.password_hash, password)
+        if new_hash is not None:
+            self.password_hash = new_hash
+        return is_valid
 
     @property
     def full_name(self):
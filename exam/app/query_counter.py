@@ -0,0 +1,34 @@
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from .models import db
+
+class TooManyQueriesError(RuntimeError):
+    pass
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.sql_statements_count = g.get('sql_statements_count', 0) + 1
+
+def init_query_counter(app):
+    """Счётчик SQL-запросов на один запрос к приложению (только debug/testing).
+
+    Включается параметром SQL_QUERY_LIMIT. При превышении лимита пишется
+    предупреждение в лог, а при SQL_QUERY_LIMIT_STRICT запрос завершается ошибкой.
+    """
+    limit = app.config.get('SQL_QUERY_LIMIT')
+    if limit is None or not (app.debug or app.testing):
+        return
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _count_statement)
+
+    @app.after_request
+    def check_query_count(response):
+        count = g.get('sql_statements_count', 0)
+        if count > limit:
+            message = f'Представление {request.endpoint} выполнило {count} SQL-запросов (лимит {limit})'
+            if app.config.get('SQL_QUERY_LIMIT_STRICT'):
+                raise TooManyQueriesError(message)
+            app.logger.warning(message)
+        return response
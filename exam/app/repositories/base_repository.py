@@ -1,11 +1,73 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_sqlalchemy.extension import Pagination
-from sqlalchemy import func, select
+from sqlalchemy import func, select, and_, or_
 
 from typing import Optional, TypeVar, Type, List
+from datetime import datetime
+import base64
+import binascii
+import json
 
 T = TypeVar('T')
 
+class KeysetPagination:
+    """Страница выборки по ключу (seek-пагинация) без OFFSET.
+
+    Курсоры непрозрачны для клиента: это base64 от значений ключа
+    сортировки граничной записи и направления перехода.
+    """
+
+    def __init__(self, items: List, per_page: int, next_cursor: Optional[str],
+                 prev_cursor: Optional[str], total: Optional[int] = None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+def encode_cursor(values: tuple, direction: str) -> str:
+    payload = [direction] + [
+        {'dt': value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> Optional[tuple]:
+    """Возвращает (direction, values) или None для повреждённого курсора"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        direction, *values = payload
+        values = tuple(
+            datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+            for value in values
+        )
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None
+    if direction not in ('next', 'prev'):
+        return None
+    return direction, values
+
+def cursor_matches(key_columns: tuple, values: tuple) -> bool:
+    """Значения курсора подходят к ключу сортировки по числу и типам"""
+    if len(values) != len(key_columns):
+        return False
+    for column, value in zip(key_columns, values):
+        try:
+            expected = column.type.python_type
+        except NotImplementedError:
+            expected = object
+        if value is None or not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+            return False
+    return True
+
 class BaseRepository:
     model: Type[T] = None
     default_order_by: tuple = None
@@ -37,6 +99,53 @@ class BaseRepository:
             
         return self.db.paginate(query, per_page=self.per_page, error_out=False)
 
+    def _keyset_paginate(self, query, key_columns: tuple, cursor: Optional[str] = None,
+                         with_total: bool = True) -> KeysetPagination:
+        """Пагинация по убыванию key_columns (последняя колонка должна быть
+        уникальной). query не должен содержать ORDER BY."""
+        total = None
+        if with_total:
+            total = self.db.session.execute(
+                select(func.count()).select_from(query.order_by(None).subquery())
+            ).scalar_one()
+
+        decoded = decode_cursor(cursor) if cursor else None
+        # Подделанный или чужой курсор, как и нечитаемый, ведёт на первую страницу
+        if decoded and not cursor_matches(key_columns, decoded[1]):
+            decoded = None
+        direction, values = decoded if decoded else ('next', None)
+
+        def seek(columns, values, descending):
+            # (a, b) < (x, y)  ->  a < x OR (a = x AND b < y)
+            column, value = columns[0], values[0]
+            compare = column < value if descending else column > value
+            if len(columns) == 1:
+                return compare
+            return or_(compare, and_(column == value, seek(columns[1:], values[1:], descending)))
+
+        descending = direction == 'next'
+        if values is not None:
+            query = query.where(seek(key_columns, values, descending))
+        order = [column.desc() if descending else column.asc() for column in key_columns]
+        rows = self.db.session.execute(
+            query.order_by(*order).limit(self.per_page + 1)
+        ).scalars().all()
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not descending:
+            rows.reverse()
+
+        def key_of(row):
+            return tuple(getattr(row, column.key) for column in key_columns)
+
+        next_cursor = prev_cursor = None
+        if rows:
+            if has_more or not descending:
+                next_cursor = encode_cursor(key_of(rows[-1]), 'next')
+            if values is not None and (has_more or descending):
+                prev_cursor = encode_cursor(key_of(rows[0]), 'prev')
+        return KeysetPagination(rows, self.per_page, next_cursor, prev_cursor, total)
+
     def create(self, **data) -> T:
         obj = self.model(**data)
         self.db.session.add(obj)
@@ -1,49 +1,113 @@
 from datetime import datetime
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from flask_sqlalchemy.extension import Pagination
+from sqlalchemy.orm import undefer, joinedload, selectinload
 
-from .base_repository import BaseRepository
-from ..models import Event
+from .base_repository import BaseRepository, KeysetPagination
+from ..models import Event, Registration
+from .. import descriptions
+
+LOADING_PROFILES = {
+    'listing': (
+        joinedload(Event.organizer),
+    ),
+    'detail': (
+        joinedload(Event.organizer),
+        selectinload(Event.registrations),
+        undefer(Event.description_html),
+    ),
+    'moderation': (
+        joinedload(Event.organizer),
+        selectinload(Event.registrations).joinedload(Registration.volunteer),
+        undefer(Event.description_html),
+    ),
+}
 
 class EventRepository(BaseRepository):
     model = Event
     default_order_by = (Event.date.desc(),)
     per_page = 10
 
+    def _loading_options(self, profile: Optional[str]) -> tuple:
+        if profile is None:
+            return ()
+        if profile not in LOADING_PROFILES:
+            raise ValueError(f"Loading profile '{profile}' not found. Available: {list(LOADING_PROFILES.keys())}")
+        return LOADING_PROFILES[profile]
+
+    def get_event(self, event_id: int, profile: Optional[str] = None) -> Optional[Event]:
+        return self.db.session.get(Event, event_id, options=self._loading_options(profile))
+
     def get_events_by_organizer(self, organizer_id: int) -> List[Event]:
         return self.get_all(organizer_id=organizer_id)
 
-    def get_upcoming_events(self) -> Tuple[Pagination, List[Event]]:
+    def _upcoming_events_query(self, with_counts: bool, profile: Optional[str]):
         query = (
             self.db.select(Event)
             .filter(Event.date >= datetime.now())
-            .order_by(*self.default_order_by)
+            .options(*self._loading_options(profile))
         )
+        if with_counts:
+            # Количество принятых заявок считается подзапросом в том же SELECT,
+            # поэтому Event.volunteer_registered не загружает registrations
+            query = query.options(undefer(Event.accepted_count))
+        return query
+
+    def get_upcoming_events(self, with_counts: bool = False,
+                            profile: Optional[str] = None) -> Tuple[Pagination, List[Event]]:
+        query = self._upcoming_events_query(with_counts, profile).order_by(*self.default_order_by)
         pagination = self.db.paginate(query, per_page=self.per_page)
         return pagination, pagination.items
 
+    def get_upcoming_events_keyset(self, cursor: Optional[str] = None, with_total: bool = True,
+                                   with_counts: bool = False,
+                                   profile: Optional[str] = None) -> Tuple[KeysetPagination, List[Event]]:
+        """Те же мероприятия, но постранично по ключу (date, id) вместо OFFSET;
+        with_total=False не выполняет COUNT(*)."""
+        query = self._upcoming_events_query(with_counts, profile)
+        pagination = self._keyset_paginate(query, (Event.date, Event.id), cursor, with_total)
+        return pagination, pagination.items
+
+    def _rendered_description(self, description: str) -> dict:
+        return {
+            'description_html': descriptions.render(description),
+            'description_hash': descriptions.content_hash(description),
+        }
+
+    def ensure_description_html(self, event: Event) -> str:
+        """HTML описания из кэша; для старых или изменённых в обход
+        репозитория записей рендерится заново и сохраняется."""
+        if (event.description_html is None
+                or event.description_hash != descriptions.content_hash(event.description)):
+            self.update(event, **self._rendered_description(event.description))
+            self.save()
+        return event.description_html
+
     def create_event(self, name: str, description: str, date: datetime, 
                     location: str, volunteer_required: int, image: str, 
-                    organizer_id: int) -> Event:
+                    organizer_id: int, image_hash: Optional[str] = None) -> Event:
         event = self.create(
             name=name,
             description=description,
+            **self._rendered_description(description),
             date=date,
             location=location,
             volunteer_required=volunteer_required,
             image=image,
+            image_hash=image_hash,
             organizer_id=organizer_id
         )
         self.save()
         return event
 
     def update_event(self, event: Event, **data) -> Event:
+        if 'description' in data:
+            data.update(self._rendered_description(data['description']))
         updated_event = self.update(event, **data)
         self.save()
         return updated_event
 
-    def delete_event(self, event_id: int) -> None:
-        event = self.get_by_id(event_id)
+    def delete_event(self, event: Event) -> None:
         self.delete(event)
         self.save()
         return True
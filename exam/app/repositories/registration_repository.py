@@ -1,7 +1,18 @@
-from typing import List, Optional
+from typing import Iterable, List, NamedTuple, Optional
 from datetime import datetime
+from sqlalchemy import func, select, update
 from .base_repository import BaseRepository
-from ..models import Registration, RegistrationStatus
+from ..models import Event, Registration, RegistrationStatus
+
+class ModerationResult(NamedTuple):
+    accepted: int
+    rejected: int
+    accepted_count: int
+    volunteer_required: int
+
+    @property
+    def is_full(self) -> bool:
+        return self.accepted_count >= self.volunteer_required
 
 class RegistrationRepository(BaseRepository):
     model = Registration
@@ -31,7 +42,7 @@ class RegistrationRepository(BaseRepository):
             volunteer_id=volunteer_id,
             contact_info=contact_info,
             date=datetime.now(),
-            status=RegistrationStatus.PENDING
+            status=RegistrationStatus.pending
         )
         self.save()
         return registration
@@ -45,11 +56,86 @@ class RegistrationRepository(BaseRepository):
     
     def get_pending_registrations(self) -> List[Registration]:
         """Получить все регистрации в статусе ожидания"""
-        return self.get_all(status=RegistrationStatus.PENDING)
+        return self.get_all(status=RegistrationStatus.pending)
     
     def get_accepted_registrations_count(self, event_id: int) -> int:
         """Получить количество принятых регистраций для события"""
         accepted_registrations = self.get_event_registrations(
-            event_id, RegistrationStatus.ACCEPTED
+            event_id, RegistrationStatus.accepted
         )
         return len(accepted_registrations)
+
+    def _count_accepted(self, event_id: int) -> int:
+        return self.db.session.execute(
+            select(func.count())
+            .select_from(Registration)
+            .where(Registration.event_id == event_id,
+                   Registration.status == RegistrationStatus.accepted)
+        ).scalar_one()
+
+    def _set_pending_status(self, event_id: int, status: RegistrationStatus,
+                            volunteer_ids: Optional[List[int]] = None) -> int:
+        """UPDATE ... WHERE event_id = ? AND volunteer_id IN (...) для ожидающих заявок"""
+        query = (
+            update(Registration)
+            .where(Registration.event_id == event_id,
+                   Registration.status == RegistrationStatus.pending)
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        if volunteer_ids is not None:
+            query = query.where(Registration.volunteer_id.in_(volunteer_ids))
+        return self.db.session.execute(query).rowcount
+
+    def moderate_registrations(self, event_id: int, volunteer_ids: Iterable[int],
+                               status: RegistrationStatus) -> Optional[ModerationResult]:
+        """Принять или отклонить набор заявок на мероприятие в одной транзакции.
+
+        Строка мероприятия блокируется (SELECT ... FOR UPDATE), поэтому
+        параллельные модераторы не превысят volunteer_required: принимаются
+        только самые ранние заявки в пределах свободных мест. Если набор
+        завершён, оставшиеся ожидающие заявки отклоняются одним UPDATE.
+        Возвращает None, если мероприятие не найдено.
+        """
+        volunteer_ids = list(set(volunteer_ids))
+        session = self.db.session
+        try:
+            volunteer_required = session.execute(
+                select(Event.volunteer_required)
+                .where(Event.id == event_id)
+                .with_for_update()
+            ).scalar_one_or_none()
+            if volunteer_required is None:
+                self.rollback()
+                return None
+
+            accepted_count = self._count_accepted(event_id)
+            accepted = rejected = 0
+            if status == RegistrationStatus.accepted:
+                free_places = volunteer_required - accepted_count
+                if free_places > 0 and volunteer_ids:
+                    accepted_ids = session.execute(
+                        select(Registration.volunteer_id)
+                        .where(Registration.event_id == event_id,
+                               Registration.volunteer_id.in_(volunteer_ids),
+                               Registration.status == RegistrationStatus.pending)
+                        .order_by(Registration.date)
+                        .limit(free_places)
+                    ).scalars().all()
+                    if accepted_ids:
+                        accepted = self._set_pending_status(event_id, RegistrationStatus.accepted, accepted_ids)
+                    accepted_count += accepted
+            elif volunteer_ids:
+                rejected = self._set_pending_status(event_id, RegistrationStatus.rejected, volunteer_ids)
+
+            if accepted_count >= volunteer_required:
+                rejected += self._set_pending_status(event_id, RegistrationStatus.rejected)
+            self.save()
+        except Exception:
+            self.rollback()
+            raise
+        return ModerationResult(accepted, rejected, accepted_count, volunteer_required)
+
+    def approve_with_capacity(self, event_id: int, volunteer_id: int) -> Optional[ModerationResult]:
+        """Принять одну заявку с учётом лимита волонтёров"""
+        return self.moderate_registrations(event_id, [volunteer_id], RegistrationStatus.accepted)
@@ -1,6 +1,62 @@
+import time
+from threading import Lock
 from typing import Optional
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
 from .base_repository import BaseRepository
-from ..models import User
+from ..models import User, Role
+
+class UserSnapshotCache:
+    """Кэш снимков пользователя вместе с ролью в памяти процесса.
+
+    Хранятся значения колонок, а не ORM-объекты, поэтому снимок не зависит
+    от сессии запроса, в котором был загружен.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._snapshots = {}
+
+    def get(self, user_id: int):
+        with self._lock:
+            entry = self._snapshots.get(user_id)
+            if entry is None:
+                return None
+            expires_at, snapshot = entry
+            if expires_at < time.monotonic():
+                del self._snapshots[user_id]
+                return None
+            return snapshot
+
+    def put(self, user: User, ttl: float) -> None:
+        snapshot = (_column_values(user), _column_values(user.role))
+        with self._lock:
+            self._snapshots[user.id] = (time.monotonic() + ttl, snapshot)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._snapshots.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+
+def _column_values(obj) -> dict:
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(type(obj)).column_attrs}
+
+user_snapshots = UserSnapshotCache()
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user_snapshot(mapper, connection, target):
+    user_snapshots.invalidate(target.id)
+
+@event.listens_for(Role, 'after_update')
+@event.listens_for(Role, 'after_delete')
+def _invalidate_role_snapshots(mapper, connection, target):
+    user_snapshots.clear()
 
 class UserRepository(BaseRepository):
     model = User
@@ -10,6 +66,26 @@ class UserRepository(BaseRepository):
         users = self.get_all(id=id)
         return users[0] if users else None
 
+    def get_user_with_role(self, id: int, cache_ttl: Optional[float] = None) -> Optional[User]:
+        """Загрузка пользователя для Flask-Login: сначала карта идентичности
+        сессии и кэш снимков, затем один SELECT с JOIN на roles."""
+        if cache_ttl:
+            snapshot = user_snapshots.get(id)
+            if snapshot is not None:
+                return self._restore_snapshot(*snapshot)
+        user = self.db.session.get(User, id, options=[joinedload(User.role)])
+        if cache_ttl and user is not None:
+            user_snapshots.put(user, cache_ttl)
+        return user
+
+    def _restore_snapshot(self, user_values: dict, role_values: dict) -> User:
+        user = User(**user_values)
+        role = Role(**role_values)
+        make_transient_to_detached(role)
+        set_committed_value(user, 'role', role)
+        make_transient_to_detached(user)
+        return self.db.session.merge(user, load=False)
+
     def get_user_by_login(self, login: str) -> Optional[User]:
         users = self.get_all(login=login)
         return users[0] if users else None
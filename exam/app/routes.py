@@ -1,5 +1,6 @@
-from flask import Blueprint, redirect, url_for, send_from_directory, abort, current_app
+from flask import Blueprint, redirect, url_for, send_from_directory, abort, current_app, request
 from .models import db
+from common.images import send_image, send_thumbnail
 
 bp = Blueprint('main', __name__)
 
@@ -11,5 +12,14 @@ def index():
 def image(image_id):
     if image_id is None:
         abort(404)
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'],
-                               image_id)
+    # Имя файла уникально (UUID или SHA-256 содержимого) и служит ETag
+    return send_image(current_app.config['UPLOAD_FOLDER'], image_id,
+                      etag=image_id.rsplit('.', 1)[0])
+
+@bp.route('/images/<image_id>/thumbnail')
+def thumbnail(image_id):
+    return send_thumbnail(current_app.config['UPLOAD_FOLDER'], image_id,
+                          etag=image_id.rsplit('.', 1)[0],
+                          width=request.args.get('w', type=int),
+                          height=request.args.get('h', type=int),
+                          fmt=request.args.get('format', 'webp'))
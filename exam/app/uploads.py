@@ -0,0 +1,77 @@
+import hashlib
+import os
+import tempfile
+
+from flask import current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_IMAGE_SIZE = 5 * 1024 * 1024
+# Запас на остальные поля формы мероприятия и заголовки multipart
+FORM_OVERHEAD = 1024 * 1024
+
+class UploadError(ValueError):
+    pass
+
+def handle_request_too_large(err):
+    max_size = current_app.config.get('MAX_IMAGE_SIZE', DEFAULT_MAX_IMAGE_SIZE)
+    return f'Размер файла превышает {max_size // (1024 * 1024)} МБ', 413
+
+def init_uploads(app):
+    """Ограничить размер тела запроса исходя из MAX_IMAGE_SIZE.
+
+    С MAX_CONTENT_LENGTH werkzeug отвечает 413 ещё при разборе запроса, не
+    буферизуя тело multipart на диск; явно заданное значение не меняется.
+    """
+    if app.config.get('MAX_CONTENT_LENGTH') is None:
+        max_size = app.config.get('MAX_IMAGE_SIZE', DEFAULT_MAX_IMAGE_SIZE)
+        app.config['MAX_CONTENT_LENGTH'] = max_size + FORM_OVERHEAD
+    app.register_error_handler(RequestEntityTooLarge, handle_request_too_large)
+
+def image_extension(filename: str):
+    if '.' not in filename:
+        return None
+    extension = filename.rsplit('.', 1)[1].lower()
+    return extension if extension in ALLOWED_IMAGE_EXTENSIONS else None
+
+def save_image(file) -> tuple[str, str]:
+    """Сохранить загруженное изображение под именем, производным от содержимого.
+
+    Файл читается из потока блоками во временный файл с одновременным
+    подсчётом SHA-256 и размера. Размер всего запроса ограничивает
+    MAX_CONTENT_LENGTH (см. init_uploads), проверка MAX_IMAGE_SIZE здесь —
+    дополнительная защита для отдельного файла.
+    Одинаковые изображения сохраняются в UPLOAD_FOLDER один раз.
+    Возвращает (имя файла, sha256).
+    """
+    extension = image_extension(file.filename)
+    if extension is None:
+        raise UploadError('Недопустимый формат файла. Разрешены: PNG, JPG, JPEG, GIF')
+    max_size = current_app.config.get('MAX_IMAGE_SIZE', DEFAULT_MAX_IMAGE_SIZE)
+
+    upload_dir = current_app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_dir, exist_ok=True)
+    sha256 = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=upload_dir, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while chunk := file.stream.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadError(f'Размер файла превышает {max_size // (1024 * 1024)} МБ')
+                sha256.update(chunk)
+                tmp.write(chunk)
+        digest = sha256.hexdigest()
+        filename = f'{digest}.{extension}'
+        file_path = os.path.join(upload_dir, filename)
+        if os.path.exists(file_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return filename, digest
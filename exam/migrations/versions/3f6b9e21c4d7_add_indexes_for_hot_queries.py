@@ -0,0 +1,36 @@
+"""Add indexes for hot queries
+
+Revision ID: 3f6b9e21c4d7
+Revises: 8c1f2d7a4b90
+Create Date: 2026-10-18 11:20:47.562913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6b9e21c4d7'
+down_revision = '8c1f2d7a4b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.create_index('ix_events_date_id', ['date', 'id'], unique=False)
+        batch_op.create_index('ix_events_organizer_id', ['organizer_id'], unique=False)
+
+    with op.batch_alter_table('registrations', schema=None) as batch_op:
+        batch_op.create_index('ix_registrations_event_id_status', ['event_id', 'status'], unique=False)
+        batch_op.create_index('ix_registrations_volunteer_id', ['volunteer_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('registrations', schema=None) as batch_op:
+        batch_op.drop_index('ix_registrations_volunteer_id')
+        batch_op.drop_index('ix_registrations_event_id_status')
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_index('ix_events_organizer_id')
+        batch_op.drop_index('ix_events_date_id')
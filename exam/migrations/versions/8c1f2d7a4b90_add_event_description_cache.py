@@ -0,0 +1,29 @@
+"""Add rendered description cache to events
+
+Revision ID: 8c1f2d7a4b90
+Revises: 540a15c8b2d5
+Create Date: 2026-10-18 10:05:12.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1f2d7a4b90'
+down_revision = '540a15c8b2d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # HTML для существующих мероприятий заполняется при первом просмотре
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('description_html', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('description_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_column('description_hash')
+        batch_op.drop_column('description_html')
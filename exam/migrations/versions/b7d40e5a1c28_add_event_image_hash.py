@@ -0,0 +1,26 @@
+"""Add image hash to events
+
+Revision ID: b7d40e5a1c28
+Revises: 3f6b9e21c4d7
+Create Date: 2026-10-18 12:02:31.904116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d40e5a1c28'
+down_revision = '3f6b9e21c4d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_column('image_hash')
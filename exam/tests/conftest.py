@@ -0,0 +1,76 @@
+import os
+import sys
+import pytest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.models import db, Role, User, Event
+
+PASSWORD = 'qwerty'
+
+
+@pytest.fixture
+def app(tmp_path):
+    test_config = {
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SECRET_KEY': 'test-secret-key',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'UPLOAD_FOLDER': str(tmp_path),
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    }
+    app = create_app(test_config)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Role(id=1, name='администратор', description=''),
+            Role(id=2, name='модератор', description=''),
+            Role(id=3, name='пользователь', description=''),
+        ])
+        for user_id, login, role_id in [(1, 'admin', 1), (2, 'moderator', 2), (3, 'user', 3)]:
+            user = User(id=user_id, login=login, last_name='Иванов', first_name='Иван', role_id=role_id)
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    def login(user_login):
+        response = client.post('/auth/login', data={'login': user_login, 'password': PASSWORD})
+        assert response.status_code == 302
+    return login
+
+
+@pytest.fixture
+def volunteers(app):
+    """Пять волонтёров с id 11..15"""
+    users = []
+    for number in range(11, 16):
+        user = User(id=number, login=f'volunteer{number}', last_name='Петров', first_name='Пётр', role_id=3)
+        user.set_password(PASSWORD)
+        users.append(user)
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+@pytest.fixture
+def event(app):
+    event = Event(id=1, name='Субботник', description='**Уборка** парка',
+                  date=datetime.now() + timedelta(days=7), location='Парк',
+                  volunteer_required=2, image='image.jpg', organizer_id=1)
+    db.session.add(event)
+    db.session.commit()
+    return event
@@ -0,0 +1,32 @@
+import pytest
+
+
+@pytest.fixture
+def login_capacity(app):
+    from app.ratelimit import login_throttle
+
+    app.config.update(LOGIN_THROTTLE_LOGIN_CAPACITY=3)
+    login_throttle.init_app(app)
+    return 3
+
+
+def test_login_throttled_by_login(client, login_capacity, mocker):
+    for _ in range(login_capacity):
+        response = client.post('/auth/login', data={'login': 'user', 'password': 'wrong'})
+        assert response.status_code == 200
+
+    get_user_by_login = mocker.patch('app.auth.user_repository.get_user_by_login')
+    response = client.post('/auth/login', data={'login': 'user', 'password': 'qwerty'})
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+    get_user_by_login.assert_not_called()
+
+
+def test_successful_login_resets_login_bucket(client, login_capacity):
+    for _ in range(login_capacity - 1):
+        client.post('/auth/login', data={'login': 'user', 'password': 'wrong'})
+    assert client.post('/auth/login', data={'login': 'user', 'password': 'qwerty'}).status_code == 302
+    client.get('/auth/logout')
+    for _ in range(login_capacity):
+        response = client.post('/auth/login', data={'login': 'user', 'password': 'wrong'})
+        assert response.status_code == 200
@@ -0,0 +1,158 @@
+import pytest
+
+from app.models import db, Event, Registration, RegistrationStatus
+
+
+def test_delete_event(client, login, event, volunteers):
+    db.session.add(Registration(event_id=event.id, volunteer_id=volunteers[0].id, contact_info='+7 900 000-00-00'))
+    db.session.commit()
+    login('admin')
+
+    response = client.post(f'/events/{event.id}/delete', follow_redirects=True)
+    assert 'Мероприятие успешно удалено' in response.get_data(as_text=True)
+    db.session.expire_all()
+    assert db.session.get(Event, event.id) is None
+    assert db.session.query(Registration).count() == 0
+
+
+def test_delete_event_requires_admin(client, login, event):
+    login('moderator')
+    client.post(f'/events/{event.id}/delete')
+    db.session.expire_all()
+    assert db.session.get(Event, event.id) is not None
+
+
+def test_keyset_pagination_ignores_tampered_cursor(app, client, event):
+    import base64
+    import json
+    from app.repositories.base_repository import encode_cursor
+
+    app.config['EVENTS_KEYSET_PAGINATION'] = True
+    tampered = [
+        ['next'],
+        ['next', 1],
+        ['next', {'dt': event.date.isoformat()}, 1, 2],
+        ['next', 'not a date', 1],
+        ['next', {'dt': event.date.isoformat()}, 'x'],
+    ]
+    for payload in tampered:
+        cursor = base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+        response = client.get(f'/events/?cursor={cursor}')
+        assert response.status_code == 200
+        assert 'Субботник' in response.get_data(as_text=True)
+
+    # Корректный курсор за последним мероприятием даёт пустую страницу
+    cursor = encode_cursor((event.date, event.id), 'next')
+    assert 'Субботник' not in client.get(f'/events/?cursor={cursor}').get_data(as_text=True)
+
+
+def test_show_loads_registrations_with_volunteers_at_once(app, client, login, event, volunteers):
+    from datetime import datetime, timedelta
+    from sqlalchemy import event as sa_event
+
+    event_id = event.id
+    statements = []
+    sa_event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    login('moderator')
+    # Первый показ дорендеривает и сохраняет HTML описания
+    with app.app_context():
+        client.get(f'/events/{event_id}/')
+
+    counts = []
+    for number, volunteer in enumerate(volunteers, start=1):
+        db.session.add(Registration(event_id=event_id, volunteer_id=volunteer.id, contact_info='-',
+                                    date=datetime.now() - timedelta(minutes=number)))
+        db.session.commit()
+        statements.clear()
+        # Свой контекст приложения, как у настоящего запроса: новая сессия и g
+        with app.app_context():
+            response = client.get(f'/events/{event_id}/')
+        assert response.status_code == 200
+        assert response.get_data(as_text=True).count('Петров Пётр') == number
+        counts.append(len(statements))
+    # Число запросов не зависит от числа заявок
+    assert len(set(counts)) == 1
+
+
+@pytest.fixture
+def registrations(event, volunteers):
+    """Пять ожидающих заявок на мероприятие с двумя местами, раньше всех подана заявка волонтёра 11"""
+    from datetime import datetime, timedelta
+    started = datetime.now() - timedelta(hours=1)
+    db.session.add_all([
+        Registration(event_id=event.id, volunteer_id=volunteer.id, contact_info='-',
+                     date=started + timedelta(minutes=number))
+        for number, volunteer in enumerate(volunteers)
+    ])
+    db.session.commit()
+
+
+def statuses(event_id):
+    db.session.expire_all()
+    return {
+        registration.volunteer_id: registration.status
+        for registration in db.session.query(Registration).filter_by(event_id=event_id)
+    }
+
+
+def test_approve_with_capacity_never_exceeds_limit(client, login, event, registrations):
+    login('moderator')
+    for volunteer_id in (13, 11, 15, 12, 14):
+        response = client.post(f'/events/{event.id}/approve_registration/{volunteer_id}')
+        assert response.status_code == 302
+        assert list(statuses(event.id).values()).count(RegistrationStatus.accepted) <= event.volunteer_required
+
+    result = statuses(event.id)
+    assert result == {
+        11: RegistrationStatus.accepted,
+        12: RegistrationStatus.rejected,
+        13: RegistrationStatus.accepted,
+        14: RegistrationStatus.rejected,
+        15: RegistrationStatus.rejected,
+    }
+
+
+def test_filling_event_rejects_remaining_pending(app, event, registrations):
+    from app.repositories import get_repository
+    repository = get_repository('registrations')
+
+    first = repository.approve_with_capacity(event.id, 12)
+    assert (first.accepted, first.rejected, first.is_full) == (1, 0, False)
+    second = repository.approve_with_capacity(event.id, 14)
+    assert (second.accepted, second.rejected, second.accepted_count, second.is_full) == (1, 3, 2, True)
+    assert RegistrationStatus.pending not in statuses(event.id).values()
+
+    # Повторное принятие после заполнения ничего не меняет
+    third = repository.approve_with_capacity(event.id, 11)
+    assert (third.accepted, third.rejected, third.accepted_count) == (0, 0, 2)
+    assert list(statuses(event.id).values()).count(RegistrationStatus.accepted) == 2
+
+
+def test_bulk_moderation_accepts_earliest_within_capacity(client, login, event, registrations):
+    login('moderator')
+    response = client.post(f'/events/{event.id}/moderate_registrations', follow_redirects=True,
+                           data={'action': 'accept', 'volunteer_ids': [15, 14, 12, 11]})
+    assert 'Принято заявок: 2, отклонено: 3.' in response.get_data(as_text=True)
+    result = statuses(event.id)
+    assert sorted(volunteer_id for volunteer_id, status in result.items()
+                  if status == RegistrationStatus.accepted) == [11, 12]
+    assert RegistrationStatus.pending not in result.values()
+
+    db.session.expire_all()
+    assert db.session.get(Event, event.id).volunteer_registered == event.volunteer_required
+
+
+def test_bulk_rejection_keeps_other_registrations(client, login, event, registrations):
+    login('moderator')
+    client.post(f'/events/{event.id}/moderate_registrations',
+                data={'action': 'reject', 'volunteer_ids': [11, 12]})
+    result = statuses(event.id)
+    assert [result[volunteer_id] for volunteer_id in (11, 12)] == [RegistrationStatus.rejected] * 2
+    assert [result[volunteer_id] for volunteer_id in (13, 14, 15)] == [RegistrationStatus.pending] * 3
+
+    client.post(f'/events/{event.id}/moderate_registrations',
+                data={'action': 'accept', 'volunteer_ids': [11, 13]})
+    result = statuses(event.id)
+    assert result[11] == RegistrationStatus.rejected
+    assert result[13] == RegistrationStatus.accepted
+    assert list(result.values()).count(RegistrationStatus.pending) == 2
@@ -1,7 +1,17 @@
 import os
+import sys
+
+# Общий пакет common лежит в корне репозитория. При запуске lab3 из её каталога
+# корня в sys.path нет; добавляется в конец, чтобы корневой app.py не заслонил этот модуль
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
 from flask import Flask, session, request, render_template, redirect, url_for, flash
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required
 
+from common.ratelimit import LoginThrottle
+
 
 app = Flask(__name__)
 application = app
@@ -15,6 +25,8 @@ login_manager.login_view = 'login'
 login_manager.login_message = 'Для доступа к запрашиваемой странице необходима аутентификация'
 login_manager.login_message_category = 'warning'
 
+login_throttle = LoginThrottle(app)
+
 def get_users():
     return [
         {
@@ -61,9 +73,14 @@ def login():
         login = request.form.get('login')
         password = request.form.get('password')
         remember_me = request.form.get('remember_me') == 'on'
+        retry_after = login_throttle.hit(request.remote_addr, login)
+        if retry_after:
+            error = f'Слишком много попыток входа, повторите через {retry_after} с.'
+            return render_template('auth.html', error=error), 429, {'Retry-After': str(retry_after)}
         if login and password:
             for user in get_users():
                 if user['login'] == login and user['password'] == password:
+                    login_throttle.reset(login)
                     user = User(user['id'], user['login'])
                     login_user(user, remember=remember_me)
                     flash('Вы успешно аутентифицированы', 'success')
@@ -0,0 +1,42 @@
+import importlib.util
+import os
+
+import pytest
+from werkzeug.test import Client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+@pytest.fixture
+def dispatcher():
+    # Корневой app.py подключает lab3 как пакет lab3.app.app; имя модуля app
+    # уже занято приложением lab3, поэтому файл загружается под другим именем
+    spec = importlib.util.spec_from_file_location('dispatcher', os.path.join(ROOT, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.application
+
+
+def test_login_throttled_through_root_dispatcher(dispatcher):
+    from lab3.app.app import login_throttle
+
+    login_throttle.reset('user')
+    client = Client(dispatcher)
+    for _ in range(login_throttle.login_capacity):
+        response = client.post('/lab3/login', data={'login': 'user', 'password': 'wrong'})
+        assert response.status_code == 200
+
+    response = client.post('/lab3/login', data={'login': 'user', 'password': 'qwerty'})
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+
+
+def test_successful_login_resets_login_bucket(client, correct_creds):
+    from app import login_throttle
+
+    for _ in range(login_throttle.login_capacity - 1):
+        client.post('/login', data={'login': correct_creds['login'], 'password': 'wrong'})
+    assert client.post('/login', data=correct_creds).status_code == 302
+    for _ in range(login_throttle.login_capacity):
+        response = client.post('/login', data={'login': correct_creds['login'], 'password': 'wrong'})
+        assert response.status_code == 200
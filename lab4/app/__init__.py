@@ -1,7 +1,18 @@
 import os
+import sys
 
-from flask import Flask
+# The shared common package lives at the repo root. When the app is started
+# from its own directory (flask --app app ..., scripts, tests) the root is not
+# on sys.path; it is appended so the root app.py cannot shadow this app package
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from flask import Flask, jsonify
+from flask_login import login_required
 from .db import DBConnector
+from .passwords import hasher
+from .ratelimit import login_throttle
 
 db = DBConnector()
 
@@ -15,6 +26,8 @@ def create_app(test_config=None):
         app.config.from_mapping(test_config)
         
     db.init_app(app)
+    hasher.init_app(app)
+    login_throttle.init_app(app)
     
     from .cli import init_db_command
     app.cli.add_command(init_db_command)
@@ -26,6 +39,10 @@ def create_app(test_config=None):
     from . import users
     app.register_blueprint(users.bp)
     app.route('/', endpoint='index')(users.index)
-    
+
+    @app.route('/db/pool_stats')
+    @login_required
+    def db_pool_stats():
+        return jsonify(db.pool_stats() or {'pooled': False})
     
     return app
@@ -3,6 +3,8 @@ from flask_login import LoginManager, UserMixin, current_user, login_user, logou
 
 from .repositories import UserRepository
 from .utils import check_password
+from .passwords import HasherBusyError
+from .ratelimit import login_throttle
 from . import db
 
 user_repository = UserRepository(db)
@@ -36,8 +38,17 @@ def login():
         login = request.form.get('login')
         password = request.form.get('password')
         remember_me = request.form.get('remember_me') == 'on'
-        user = user_repository.get_by_login_and_password(login, password)
+        retry_after = login_throttle.hit(request.remote_addr, login)
+        if retry_after:
+            flash(f'Слишком много попыток входа, повторите через {retry_after} с', 'danger')
+            return render_template('auth/auth.html'), 429, {'Retry-After': str(retry_after)}
+        try:
+            user = user_repository.get_by_login_and_password(login, password)
+        except HasherBusyError:
+            flash('Сервер перегружен, попробуйте войти позже', 'danger')
+            return render_template('auth/auth.html'), 503
         if user is not None:
+            login_throttle.reset(login)
             login_user(User(user['id'], user['login']), remember=remember_me)
             flash('Вы успешно аутентифицированы', 'success')
             next_page = session.pop('next', None)
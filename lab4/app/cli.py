@@ -1,18 +1,60 @@
+import random
+import time
+
 import click
 from flask import current_app
+from flask.cli import with_appcontext
 from . import db
+from .passwords import hasher
+from .utils import run_sql_script
+
+SEED_PASSWORD = 'Qwerty123'
+SEED_NAMES_POOL = 500
+
+INSERT_SEED_USER = (
+    "INSERT INTO users (login, first_name, last_name, middle_name, password_hash, role_id) "
+    "VALUES (%s, %s, %s, %s, %s, %s)"
+)
+
+def fake_names(count):
+    from faker import Faker
+    fake = Faker('ru_RU')
+    return (
+        [fake.first_name()[:25] for _ in range(count)],
+        [fake.last_name()[:25] for _ in range(count)],
+        [fake.middle_name()[:25] for _ in range(count)],
+    )
+
+def seed_users(connection, count, batch_size=1000):
+    # Names are drawn from a small pre-generated pool: calling Faker per row
+    # would dominate the run time for millions of users
+    first_names, last_names, middle_names = fake_names(SEED_NAMES_POOL)
+    password_hash = hasher.hash(SEED_PASSWORD)
+    with connection.cursor() as cursor:
+        for start in range(0, count, batch_size):
+            rows = [
+                (f'user{number:07d}', random.choice(first_names), random.choice(last_names),
+                 random.choice(middle_names), password_hash, None)
+                for number in range(start + 1, min(start + batch_size, count) + 1)
+            ]
+            # mysql-connector rewrites executemany of an INSERT into a single multi-row INSERT
+            cursor.executemany(INSERT_SEED_USER, rows)
+    connection.commit()
 
 @click.command('init-db')
-def init_db_command():
+@click.option('--seed', type=int, default=0, help='Generate N fake users after creating the tables.')
+@click.option('--batch-size', type=int, default=1000, help='Rows per INSERT when seeding.')
+@with_appcontext
+def init_db_command(seed, batch_size):
     """Clear the existing data and create new tables."""
-    from flask import current_app as app
-    with app.app_context():
-        with app.open_resource('schema.sql') as f:
-            connection = db.connect()
-            with connection.cursor() as cursor:
-                sql_commands = f.read().decode('utf8').split(';')
-                for command in sql_commands:
-                    if command.strip():
-                        cursor.execute(command)
-            connection.commit()
-        click.echo('Initialized the database.')
+    with current_app.open_resource('schema.sql') as f:
+        script = f.read().decode('utf8')
+    connection = db.connect()
+    started = time.perf_counter()
+    count = run_sql_script(connection, script)
+    click.echo(f'Initialized the database ({count} statements, {time.perf_counter() - started:.2f}s).')
+    if seed:
+        started = time.perf_counter()
+        seed_users(connection, seed, batch_size)
+        click.echo(f'Seeded {seed} users with password {SEED_PASSWORD!r} '
+                   f'in {time.perf_counter() - started:.2f}s.')
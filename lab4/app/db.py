@@ -1,14 +1,171 @@
+import time
+import weakref
+from queue import Empty, Full, LifoQueue
+from threading import Lock
+
 from flask import g
 import mysql.connector
 
+class PoolTimeoutError(Exception):
+    pass
+
+class ConnectionPool:
+    """A fixed-size pool of MySQL connections with bounded overflow.
+
+    Up to ``size`` connections are kept open between requests; under load up to
+    ``max_overflow`` extra connections are opened and closed again on return.
+    When everything is checked out, callers wait up to ``timeout`` seconds.
+    Idle connections older than ``recycle`` seconds are reopened, and with
+    ``pre_ping`` every connection is pinged before it is handed out.
+    """
+
+    def __init__(self, connect, size=5, max_overflow=10, timeout=30, recycle=3600, pre_ping=True):
+        self._connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self._idle = LifoQueue(maxsize=size)
+        self._created_at = {}
+        self._lock = Lock()
+        self._opened = 0
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'connects': 0,
+            'recycled': 0,
+            'invalidated': 0,
+        }
+
+    def _open(self):
+        connection = self._connect()
+        with self._lock:
+            self._created_at[id(connection)] = time.monotonic()
+            self._stats['connects'] += 1
+        return connection
+
+    def _discard(self, connection, reason=None):
+        with self._lock:
+            self._opened -= 1
+            self._created_at.pop(id(connection), None)
+            if reason:
+                self._stats[reason] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _reserve(self):
+        with self._lock:
+            if self._opened < self.size + self.max_overflow:
+                self._opened += 1
+                return True
+        return False
+
+    def _is_usable(self, connection):
+        created_at = self._created_at.get(id(connection), 0)
+        if self.recycle is not None and time.monotonic() - created_at > self.recycle:
+            self._discard(connection, 'recycled')
+            return False
+        if self.pre_ping:
+            try:
+                connection.ping(reconnect=False)
+            except Exception:
+                self._discard(connection, 'invalidated')
+                return False
+        return True
+
+    def checkout(self):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except Empty:
+                connection = None
+            if connection is None and self._reserve():
+                try:
+                    connection = self._open()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+                break
+            if connection is None:
+                started = time.monotonic()
+                try:
+                    connection = self._idle.get(timeout=self.timeout)
+                except Empty:
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f'No connection available within {self.timeout}s '
+                        f'(size={self.size}, max_overflow={self.max_overflow})'
+                    )
+                finally:
+                    with self._lock:
+                        self._stats['waits'] += 1
+                        self._stats['wait_time'] += time.monotonic() - started
+            if self._is_usable(connection):
+                break
+        with self._lock:
+            self._stats['checkouts'] += 1
+        return connection
+
+    def checkin(self, connection):
+        try:
+            # Do not leak an open transaction to the next request
+            connection.rollback()
+        except Exception:
+            self._discard(connection, 'invalidated')
+            return
+        try:
+            self._idle.put_nowait(connection)
+        except Full:
+            self._discard(connection)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            opened = self._opened
+        idle = self._idle.qsize()
+        stats.update(size=self.size, max_overflow=self.max_overflow,
+                     opened=opened, idle=idle, in_use=opened - idle)
+        return stats
+
+    def dispose(self):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except Empty:
+                return
+            self._discard(connection)
+
 class DBConnector:
     def __init__(self, app=None):
+        self.pool = None
+        # Prepared statements live as long as the (pooled) connection they belong to
+        self._statements = weakref.WeakKeyDictionary()
         if app is not None:
             self.init_app(app)
-            
+
     def init_app(self, app):
         self.app = app
         self.app.teardown_appcontext(self.disconnect)
+        if self.pool is not None:
+            self.pool.dispose()
+        self.pool = None
+        pool_size = app.config.get('MYSQL_POOL_SIZE', 5)
+        if pool_size:
+            self.pool = ConnectionPool(
+                lambda: mysql.connector.connect(**self._get_config()),
+                size=pool_size,
+                max_overflow=app.config.get('MYSQL_POOL_MAX_OVERFLOW', 10),
+                timeout=app.config.get('MYSQL_POOL_TIMEOUT', 30),
+                recycle=app.config.get('MYSQL_POOL_RECYCLE', 3600),
+                pre_ping=app.config.get('MYSQL_POOL_PRE_PING', True),
+            )
 
     def _get_config(self):
         return {
@@ -20,10 +177,68 @@ class DBConnector:
 
     def connect(self):
         if 'db' not in g:
-            g.db = mysql.connector.connect(**self._get_config())
+            if self.pool is not None:
+                g.db = self.pool.checkout()
+            else:
+                g.db = mysql.connector.connect(**self._get_config())
         return g.db
 
     def disconnect(self, e=None):
-        if 'db' in g:
-            g.db.close()
-        g.pop('db', None)
+        connection = g.pop('db', None)
+        if connection is None:
+            return
+        if self.pool is not None:
+            self.pool.checkin(connection)
+        else:
+            connection.close()
+
+    def _prepared(self, sql):
+        connection = self.connect()
+        statements = self._statements.setdefault(connection, {})
+        cursor = statements.get(sql)
+        if cursor is None:
+            cursor = statements[sql] = connection.cursor(prepared=True, dictionary=True)
+        return cursor
+
+    def execute(self, sql, params=()):
+        """Execute sql as a prepared statement cached on the current connection.
+
+        The statement is prepared on the server the first time it is seen on a
+        connection; later calls with the same SQL string only send the parameters.
+        """
+        cursor = self._prepared(sql)
+        cursor.execute(sql, params)
+        return cursor
+
+    def query_one(self, sql, params=()):
+        cursor = self.execute(sql, params)
+        row = cursor.fetchone()
+        cursor.fetchall()
+        return row
+
+    def query_all(self, sql, params=()):
+        return self.execute(sql, params).fetchall()
+
+    def iter_rows(self, sql, params=(), batch_size=500):
+        """Stream rows through an unbuffered cursor, fetching batch_size rows at a time.
+
+        The connection cannot run other queries until the iterator is exhausted or closed.
+        """
+        connection = self.connect()
+        with connection.cursor(dictionary=True, buffered=False) as cursor:
+            try:
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        return
+                    yield from rows
+            finally:
+                # Stopped early (closed, or the consumer raised): drain the rest of the
+                # result, otherwise the pooled connection fails the next query with
+                # "Unread result found"
+                if connection.unread_result:
+                    connection.consume_results()
+
+    def pool_stats(self):
+        return self.pool.stats() if self.pool is not None else None
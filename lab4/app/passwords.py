@@ -0,0 +1,24 @@
+import hashlib
+import hmac
+import re
+
+from common.passwords import DEFAULT_METHOD, HasherBusyError, PasswordHasher as BasePasswordHasher
+
+# Unsalted SHA2(password, 256) hex digests written by older versions of lab4
+LEGACY_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+class PasswordHasher(BasePasswordHasher):
+    """The shared PasswordHasher that also accepts lab4's legacy SHA2 digests.
+
+    Only lab4 ever stored them, so the other apps use the base class. A legacy
+    digest never matches the configured prefix, so needs_rehash reports it and
+    it is replaced with a proper hash on the next successful login.
+    """
+
+    def verify(self, password_hash, password):
+        if password_hash and password is not None and LEGACY_SHA256_RE.match(password_hash):
+            digest = hashlib.sha256(password.encode('utf-8')).hexdigest()
+            return hmac.compare_digest(digest, password_hash)
+        return super().verify(password_hash, password)
+
+hasher = PasswordHasher()
@@ -0,0 +1,4 @@
+from common.ratelimit import LoginThrottle
+
+# Configured per app in create_app through login_throttle.init_app
+login_throttle = LoginThrottle()
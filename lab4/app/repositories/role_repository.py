@@ -1,3 +1,6 @@
+SELECT_ALL = "SELECT * FROM roles"
+SELECT_BY_ID = "SELECT * FROM roles WHERE id = %s"
+
 class Role:
     def __init__(self, id, name):
         self.id = id
@@ -8,18 +11,13 @@ class RoleRepository:
         self.db_connector = db_connector
 
     def all(self):
-        with self.db_connector.connect().cursor(dictionary=True) as cursor:
-            cursor.execute("SELECT * FROM roles")
-            roles_data = cursor.fetchall()
-            roles = []
-            for role_data in roles_data:
-                roles.append(Role(role_data['id'], role_data['name']))
-            return roles
+        roles = []
+        for role_data in self.db_connector.query_all(SELECT_ALL):
+            roles.append(Role(role_data['id'], role_data['name']))
+        return roles
 
     def get_by_id(self, role_id):
-        with self.db_connector.connect().cursor(dictionary=True) as cursor:
-            cursor.execute("SELECT * FROM roles WHERE id = %s", (role_id,))
-            role_data = cursor.fetchone()
-            if role_data:
-                return Role(role_data['id'], role_data['name'])
-            return None
\ No newline at end of file
+        role_data = self.db_connector.query_one(SELECT_BY_ID, (role_id,))
+        if role_data:
+            return Role(role_data['id'], role_data['name'])
+        return None
@@ -1,65 +1,62 @@
+from ..passwords import hasher
+
+# SQL strings are module constants: a prepared statement is reused only for the same string
+SELECT_BY_ID = "SELECT * FROM users WHERE id = %s"
+SELECT_BY_LOGIN = "SELECT * FROM users WHERE login = %s"
+SELECT_ALL = "SELECT users.*, roles.name AS role FROM users LEFT JOIN roles ON users.role_id = roles.id"
+INSERT = (
+    "INSERT INTO users (login, password_hash, first_name, middle_name, last_name, role_id) VALUES "
+    "(%s, %s, %s, %s, %s, %s)"
+)
+UPDATE = ("UPDATE users SET first_name = %s, "
+          "middle_name = %s, last_name = %s, "
+          "role_id = %s WHERE id = %s")
+DELETE = "DELETE FROM users WHERE id = %s"
+UPDATE_PASSWORD = "UPDATE users SET password_hash = %s WHERE id = %s"
+
 class UserRepository:
     def __init__(self, db_connector):
         self.db_connector = db_connector
 
     def get_by_id(self, user_id):
-        with self.db_connector.connect().cursor(dictionary=True) as cursor:
-            cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-            user = cursor.fetchone()
-        return user
+        return self.db_connector.query_one(SELECT_BY_ID, (user_id,))
 
     def get_by_login_and_password(self, login, password):
-        with self.db_connector.connect().cursor(dictionary=True) as cursor:
-            cursor.execute("SELECT * FROM users WHERE login = %s AND password_hash = SHA2(%s, 256);", (login, password))
-            user = cursor.fetchone()
+        user = self.db_connector.query_one(SELECT_BY_LOGIN, (login,))
+        if user is None:
+            return None
+        is_valid, new_hash = hasher.verify_and_update(user['password_hash'], password)
+        if not is_valid:
+            return None
+        if new_hash is not None:
+            # The stored hash uses outdated parameters: upgrade it while the password is known
+            self.db_connector.execute(UPDATE_PASSWORD, (new_hash, user['id']))
+            self.db_connector.connect().commit()
         return user
 
     def all(self):
-        with self.db_connector.connect().cursor(dictionary=True) as cursor:
-            cursor.execute("SELECT users.*, roles.name AS role FROM users LEFT JOIN roles ON users.role_id = roles.id")
-            users = cursor.fetchall()
-        return users
+        return self.db_connector.query_all(SELECT_ALL)
+
+    def iter_all(self, batch_size=500):
+        return self.db_connector.iter_rows(SELECT_ALL, batch_size=batch_size)
 
     def create(self, login, password, first_name, middle_name, last_name, role_id):
-        connection = self.db_connector.connect()
-        with connection.cursor(dictionary=True) as cursor:
-            query = (
-                "INSERT INTO users (login, password_hash, first_name, middle_name, last_name, role_id) VALUES "
-                "(%s, SHA2(%s, 256), %s, %s, %s, %s)"
-            )
-            user_data = (login, password, first_name, middle_name, last_name, role_id)
-            cursor.execute(query, user_data)
-            connection.commit()
+        user_data = (login, hasher.hash(password), first_name, middle_name, last_name, role_id)
+        self.db_connector.execute(INSERT, user_data)
+        self.db_connector.connect().commit()
 
     def update(self, user_id, first_name, middle_name, last_name, role_id):
-        connection = self.db_connector.connect()
-        with connection.cursor(dictionary=True) as cursor:
-            query = ("UPDATE users SET first_name = %s, "
-                    "middle_name = %s, last_name = %s, "
-                    "role_id = %s WHERE id = %s")
-            user_data = (first_name, middle_name, last_name, role_id, user_id)
-            cursor.execute(query, user_data)
-            connection.commit()
+        user_data = (first_name, middle_name, last_name, role_id, user_id)
+        self.db_connector.execute(UPDATE, user_data)
+        self.db_connector.connect().commit()
 
     def delete(self, user_id):
-        connection = self.db_connector.connect()
-        with connection.cursor(dictionary=True) as cursor:
-            cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
-            connection.commit()
+        self.db_connector.execute(DELETE, (user_id,))
+        self.db_connector.connect().commit()
 
     def check_password(self, login, password):
-        with self.db_connector.connect().cursor(dictionary=True) as cursor:
-            cursor.execute(
-                "SELECT 1 FROM users WHERE login = %s AND password_hash = SHA2(%s, 256)",
-                (login, password)
-            )
-            return cursor.fetchone() is not None
+        return self.get_by_login_and_password(login, password) is not None
 
     def update_password(self, user_id, new_password):
-        connection = self.db_connector.connect()
-        with connection.cursor(dictionary=True) as cursor:
-            cursor.execute(
-                "UPDATE users SET password_hash = SHA2(%s, 256) WHERE id = %s",
-                (new_password, user_id)
-            )
-            connection.commit()
\ No newline at end of file
+        self.db_connector.execute(UPDATE_PASSWORD, (hasher.hash(new_password), user_id))
+        self.db_connector.connect().commit()
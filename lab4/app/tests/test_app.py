@@ -1,6 +1,8 @@
+import hashlib
 import os
 import sys
 import pytest
+from werkzeug.security import generate_password_hash
 
 # Add the project root to the path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
@@ -8,7 +10,11 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from lab4.app import create_app
 from lab4.app.repositories import UserRepository, RoleRepository
-from lab4.app.utils import check_login, check_password
+from lab4.app.passwords import HasherBusyError, PasswordHasher, hasher
+from common.ratelimit import MemoryBucketStore, SQLiteBucketStore
+from lab4.app.utils import check_login, check_password, split_sql_statements
+
+TEST_HASH_METHOD = 'pbkdf2:sha256:1000'
 
 
 @pytest.fixture
@@ -20,7 +26,8 @@ def app():
         'MYSQL_USER': 'test_user',
         'MYSQL_PASSWORD': 'test_password',
         'MYSQL_HOST': 'localhost',
-        'MYSQL_DATABASE': 'test_database'
+        'MYSQL_DATABASE': 'test_database',
+        'PASSWORD_HASH_METHOD': TEST_HASH_METHOD,
     }
     app = create_app(test_config)
     return app
@@ -38,6 +45,7 @@ def mock_db_connector(mocker):
     mock_cursor = mocker.MagicMock()
     mock_cursor.__enter__ = mocker.MagicMock(return_value=mock_cursor)
     mock_cursor.__exit__ = mocker.MagicMock(return_value=None)
+    mock_cursor.fetchmany.return_value = []
     mock_connection.cursor.return_value = mock_cursor
     mock_connect.return_value = mock_connection
     return mock_cursor
@@ -51,6 +59,7 @@ def sample_user():
         'first_name': 'Тест',
         'last_name': 'Пользователь',
         'middle_name': 'Тестович',
+        'password_hash': generate_password_hash('qwerty', TEST_HASH_METHOD),
         'role_id': 1
     }
 
@@ -353,7 +362,7 @@ def test_user_repository_get_by_id(mocker, sample_user):
     mock_db = mocker.MagicMock(spec=DBConnector)
     user_repo = UserRepository(mock_db)
     
-    mock_db.connect.return_value.cursor.return_value.__enter__.return_value.fetchone.return_value = sample_user
+    mock_db.query_one.return_value = sample_user
     
     result = user_repo.get_by_id(1)
     assert result == sample_user
@@ -366,10 +375,58 @@ def test_user_repository_get_by_login_and_password(mocker, sample_user):
     mock_db = mocker.MagicMock(spec=DBConnector)
     user_repo = UserRepository(mock_db)
     
-    mock_db.connect.return_value.cursor.return_value.__enter__.return_value.fetchone.return_value = sample_user
+    mock_db.query_one.return_value = sample_user
     
-    result = user_repo.get_by_login_and_password('testuser', 'password')
+    result = user_repo.get_by_login_and_password('testuser', 'qwerty')
     assert result == sample_user
+    assert user_repo.get_by_login_and_password('testuser', 'wrong') is None
+
+
+def test_user_repository_rehashes_legacy_sha2_password(app, mocker, sample_user):
+    from lab4.app.db import DBConnector
+    from lab4.app.repositories.user_repository import UPDATE_PASSWORD
+
+    mock_db = mocker.MagicMock(spec=DBConnector)
+    user_repo = UserRepository(mock_db)
+    sample_user['password_hash'] = hashlib.sha256(b'qwerty').hexdigest()
+    mock_db.query_one.return_value = sample_user
+
+    assert user_repo.get_by_login_and_password('testuser', 'qwerty') == sample_user
+    (sql, (new_hash, user_id)), _ = mock_db.execute.call_args
+    assert sql == UPDATE_PASSWORD and user_id == sample_user['id']
+    assert new_hash.startswith(TEST_HASH_METHOD + '$')
+    assert hasher.verify(new_hash, 'qwerty')
+
+    sample_user['password_hash'] = new_hash
+    mock_db.execute.reset_mock()
+    user_repo.get_by_login_and_password('testuser', 'qwerty')
+    mock_db.execute.assert_not_called()
+
+
+def test_password_hasher_limits_concurrent_hashes():
+    import threading
+
+    busy = PasswordHasher()
+    busy.workers, busy.queue_size, busy.timeout = 1, 0, 0.05
+    release = threading.Event()
+    worker = threading.Thread(target=busy._run, args=(release.wait,))
+    worker.start()
+    try:
+        with pytest.raises(HasherBusyError):
+            busy.hash('qwerty')
+    finally:
+        release.set()
+        worker.join()
+    assert busy.verify(busy.hash('qwerty'), 'qwerty')
+    busy.shutdown()
+
+
+def test_login_when_hasher_busy(client, mock_db_connector, sample_user, mocker):
+    mock_db_connector.fetchone.return_value = sample_user
+    mocker.patch.object(hasher, 'verify', side_effect=HasherBusyError)
+    response = client.post('/auth/login', data={'login': 'admin', 'password': 'qwerty'})
+    assert response.status_code == 503
+    assert "Сервер перегружен".encode('utf-8') in response.data
 
 
 def test_role_repository_all(mocker, sample_role):
@@ -379,9 +436,211 @@ def test_role_repository_all(mocker, sample_role):
     mock_db = mocker.MagicMock(spec=DBConnector)
     role_repo = RoleRepository(mock_db)
     
-    mock_db.connect.return_value.cursor.return_value.__enter__.return_value.fetchall.return_value = [sample_role]
+    mock_db.query_all.return_value = [sample_role]
     
     result = role_repo.all()
     assert len(result) == 1
     assert result[0].id == sample_role['id']
     assert result[0].name == sample_role['name']
+
+
+# --- Connection pool tests ---
+
+@pytest.fixture
+def mysql_connect(mocker):
+    return mocker.patch('lab4.app.db.mysql.connector.connect',
+                        side_effect=lambda **kwargs: mocker.MagicMock())
+
+
+def test_pool_reuses_connection_between_requests(app, mysql_connect):
+    from lab4.app import db
+    for _ in range(3):
+        with app.app_context():
+            db.connect()
+    assert mysql_connect.call_count == 1
+    stats = db.pool_stats()
+    assert stats['checkouts'] == 3
+    assert stats['idle'] == 1
+    assert stats['in_use'] == 0
+
+
+def test_pool_overflow_and_timeout(mysql_connect):
+    from lab4.app.db import ConnectionPool, PoolTimeoutError
+    pool = ConnectionPool(mysql_connect, size=1, max_overflow=1, timeout=0.01)
+    first, second = pool.checkout(), pool.checkout()
+    with pytest.raises(PoolTimeoutError):
+        pool.checkout()
+    pool.checkin(second)
+    pool.checkin(first)
+    first.close.assert_called_once()
+    stats = pool.stats()
+    assert (stats['opened'], stats['idle'], stats['timeouts'], stats['waits']) == (1, 1, 1, 1)
+    assert pool.checkout() is second
+
+
+def test_pool_replaces_dead_and_expired_connections(mysql_connect):
+    from lab4.app.db import ConnectionPool
+    pool = ConnectionPool(mysql_connect, size=2, recycle=None)
+    dead = pool.checkout()
+    pool.checkin(dead)
+    dead.ping.side_effect = Exception('MySQL server has gone away')
+    assert pool.checkout() is not dead
+    assert pool.stats()['invalidated'] == 1
+
+    pool = ConnectionPool(mysql_connect, size=2, recycle=0)
+    old = pool.checkout()
+    pool.checkin(old)
+    assert pool.checkout() is not old
+    assert pool.stats()['recycled'] == 1
+
+
+def test_pool_disabled_opens_connection_per_request(mysql_connect):
+    from lab4.app import db
+    create_app({'TESTING': True, 'MYSQL_POOL_SIZE': 0})
+    app = db.app
+    for _ in range(2):
+        with app.app_context():
+            connection = db.connect()
+        connection.close.assert_called_once()
+    assert mysql_connect.call_count == 2
+    assert db.pool_stats() is None
+
+
+# --- Prepared statements and streaming ---
+
+def test_prepared_statements_are_reused_per_connection(app, mysql_connect):
+    from lab4.app import db
+    for _ in range(2):
+        with app.app_context():
+            for user_id in (1, 2):
+                db.query_one('SELECT * FROM users WHERE id = %s', (user_id,))
+            connection = db.connect()
+    connection.cursor.assert_called_once_with(prepared=True, dictionary=True)
+    assert connection.cursor.return_value.execute.call_count == 4
+
+
+def test_users_index_streams_rows_in_batches(client, mock_db_connector, sample_user):
+    mock_db_connector.fetchmany.side_effect = [
+        [dict(sample_user, id=1, login='first', role='admin', created_at=None),
+         dict(sample_user, id=2, login='second', role='user', created_at=None)],
+        [dict(sample_user, id=3, login='third', role='user', created_at=None)],
+        [],
+    ]
+    response = client.get('/')
+    assert response.is_streamed
+    text = response.get_data(as_text=True)
+    assert text.index('first') < text.index('second') < text.index('third')
+    assert mock_db_connector.fetchmany.call_count == 3
+    mock_db_connector.fetchall.assert_not_called()
+
+
+def test_iter_rows_drains_result_when_closed_early(app, mysql_connect):
+    from lab4.app import db
+    with app.app_context():
+        connection = db.connect()
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchmany.return_value = [{'id': 1}, {'id': 2}]
+        connection.unread_result = True
+        rows = db.iter_rows('SELECT * FROM users', batch_size=2)
+        assert next(rows) == {'id': 1}
+        rows.close()
+        connection.consume_results.assert_called_once()
+
+        connection.consume_results.reset_mock()
+        connection.unread_result = False
+        cursor.fetchmany.side_effect = [[{'id': 1}], []]
+        assert list(db.iter_rows('SELECT * FROM users')) == [{'id': 1}]
+        connection.consume_results.assert_not_called()
+
+
+# --- init-db ---
+
+def test_split_sql_statements_handles_quotes_and_comments():
+    script = '''
+        -- drop; everything
+        DROP TABLE IF EXISTS users;
+        /* multi; line
+           comment */
+        INSERT INTO roles (name, description) VALUES ('a;b', 'it''s; fine');
+        INSERT INTO roles (name) VALUES ("x\\";y"); # trailing; comment
+        SELECT `odd;name` FROM t
+    '''
+    assert split_sql_statements(script) == [
+        'DROP TABLE IF EXISTS users',
+        "INSERT INTO roles (name, description) VALUES ('a;b', 'it''s; fine')",
+        'INSERT INTO roles (name) VALUES ("x\\";y")',
+        'SELECT `odd;name` FROM t',
+    ]
+
+
+def test_init_db_runs_schema_statements_and_seeds(app, mocker):
+    connection = mocker.MagicMock()
+    cursor = connection.cursor.return_value.__enter__.return_value
+    cursor.with_rows = False
+    mocker.patch('lab4.app.db.DBConnector.connect', return_value=connection)
+
+    result = app.test_cli_runner().invoke(args=['init-db', '--seed', '2500', '--batch-size', '1000'])
+    assert result.exit_code == 0, result.output
+    assert 'Seeded 2500 users' in result.output
+
+    statements = [call.args[0] for call in cursor.execute.call_args_list]
+    assert statements[:2] == ['DROP TABLE IF EXISTS users', 'DROP TABLE IF EXISTS roles']
+    assert len(statements) == 6
+    assert not any(call.kwargs for call in cursor.execute.call_args_list)
+    assert [len(call.args[1]) for call in cursor.executemany.call_args_list] == [1000, 1000, 500]
+    assert cursor.executemany.call_args_list[-1].args[1][-1][0] == 'user0002500'
+    assert connection.commit.call_count == 2
+
+
+# --- Login throttle ---
+
+@pytest.mark.parametrize('make_store', [
+    lambda tmp_path: MemoryBucketStore(),
+    lambda tmp_path: SQLiteBucketStore(str(tmp_path / 'buckets.db')),
+])
+def test_bucket_store_token_bucket(tmp_path, make_store):
+    store = make_store(tmp_path)
+    # capacity 2, one token every 10 seconds
+    assert store.consume('ip:1', 2, 0.1, now=100) == 0
+    assert store.consume('ip:1', 2, 0.1, now=100) == 0
+    assert store.consume('ip:1', 2, 0.1, now=100) == pytest.approx(10)
+    assert store.consume('ip:2', 2, 0.1, now=100) == 0
+    assert store.consume('ip:1', 2, 0.1, now=110) == 0
+    store.reset('ip:1')
+    assert store.consume('ip:1', 2, 0.1, now=110) == 0
+
+
+def test_login_throttled_before_password_check(app, client, mock_db_connector, mocker):
+    app.config.update(LOGIN_THROTTLE_LOGIN_CAPACITY=3)
+    from lab4.app.ratelimit import login_throttle
+    login_throttle.init_app(app)
+    mock_db_connector.fetchone.return_value = None
+    for _ in range(3):
+        response = client.post('/auth/login', data={'login': 'Admin', 'password': 'wrong'})
+        assert response.status_code == 200
+
+    verify = mocker.spy(hasher, 'verify')
+    mock_db_connector.execute.reset_mock()
+    response = client.post('/auth/login', data={'login': ' admin', 'password': 'wrong'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert "Слишком много попыток входа".encode('utf-8') in response.data
+    verify.assert_not_called()
+    mock_db_connector.execute.assert_not_called()
+
+    # Other logins from the same address are still allowed
+    response = client.post('/auth/login', data={'login': 'other', 'password': 'wrong'})
+    assert response.status_code == 200
+
+
+def test_successful_login_resets_login_bucket(app, client, mock_db_connector, sample_user):
+    app.config.update(LOGIN_THROTTLE_LOGIN_CAPACITY=2)
+    from lab4.app.ratelimit import login_throttle
+    login_throttle.init_app(app)
+    mock_db_connector.fetchone.return_value = sample_user
+    client.post('/auth/login', data={'login': 'testuser', 'password': 'wrong'})
+    client.post('/auth/login', data={'login': 'testuser', 'password': 'qwerty'})
+    client.get('/auth/logout')
+    response = client.post('/auth/login', data={'login': 'testuser', 'password': 'qwerty'})
+    assert response.status_code == 302
+
@@ -1,5 +1,5 @@
-from flask import Blueprint, flash, redirect, render_template, request, url_for
-from flask_login import login_required
+from flask import Blueprint, current_app, flash, redirect, render_template, request, stream_template, url_for
+from flask_login import current_user, login_required
 import mysql.connector as connector
 
 from .repositories import UserRepository, RoleRepository
@@ -13,7 +13,11 @@ bp = Blueprint('users', __name__, url_prefix='/users')
 
 @bp.route('/')
 def index():
-    return render_template('users/index.html', users=user_repository.all())
+    # Rows are streamed over the request's connection, so the current user
+    # has to be loaded before rendering starts
+    current_user._get_current_object()
+    return stream_template('users/index.html',
+                           users=user_repository.iter_all(current_app.config.get('USERS_STREAM_BATCH_SIZE', 500)))
 
 @bp.route('/<int:user_id>')
 def show(user_id):
@@ -1 +1,2 @@
-from .checkers import check_login, check_password
\ No newline at end of file
+from .checkers import check_login, check_password
+from .sql_script import split_sql_statements, run_sql_script
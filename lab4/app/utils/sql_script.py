@@ -0,0 +1,72 @@
+from typing import List
+
+def split_sql_statements(script: str) -> List[str]:
+    """Split an SQL script into statements on top-level semicolons.
+
+    Semicolons inside quoted strings and identifiers ('...', "...", `...`)
+    and inside comments (-- ..., # ..., /* ... */) do not end a statement.
+    Comments are dropped, empty statements are skipped.
+    """
+    statements = []
+    current = []
+    i = 0
+    length = len(script)
+    while i < length:
+        char = script[i]
+        if char in ('"', "'", '`'):
+            end = i + 1
+            while end < length:
+                if script[end] == '\\' and char != '`':
+                    end += 2
+                    continue
+                if script[end] == char:
+                    # A doubled quote is an escaped quote, not the end of the literal
+                    if end + 1 < length and script[end + 1] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(script[i:end + 1])
+            i = end + 1
+        elif script.startswith('--', i) and (i + 2 == length or script[i + 2].isspace()) or char == '#':
+            end = script.find('\n', i)
+            i = length if end == -1 else end
+        elif script.startswith('/*', i):
+            end = script.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+            current.append(' ')
+        elif char == ';':
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+def run_sql_script(connection, script: str) -> int:
+    """Run the statements of script one by one and commit once at the end.
+
+    Statements are sent separately rather than with execute(multi=True), which
+    is deprecated in mysql-connector-python 8.x and removed in 9.x. Autocommit
+    is off, so data statements share one transaction that is rolled back on
+    error; DDL statements (CREATE, DROP, ...) commit implicitly in MySQL and
+    are not rolled back.
+    """
+    statements = split_sql_statements(script)
+    try:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+                if cursor.with_rows:
+                    cursor.fetchall()
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    return len(statements)
@@ -1,3 +1,13 @@
+import os
+import sys
+
+# Общий пакет common лежит в корне репозитория. При запуске из каталога
+# приложения (flask --app app ..., скрипты, тесты) корня в sys.path нет;
+# добавляется в конец, чтобы корневой app.py не заслонил этот пакет app
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
 from functools import wraps
 
 from flask import Flask, render_template, request
@@ -5,8 +15,12 @@ from flask_migrate import Migrate
 from sqlalchemy.exc import SQLAlchemyError
 
 from .models import db
+from .passwords import hasher
+from .ratelimit import login_throttle
+from .visit_log_writer import VisitLogWriter
 
 migrate = Migrate()
+visit_log_writer = VisitLogWriter()
 
 def database_error(error):
     db.session.rollback()
@@ -20,12 +34,20 @@ def create_app(test_config=None):
         app.config.from_mapping(test_config)
 
     db.init_app(app)
+    hasher.init_app(app)
+    login_throttle.init_app(app)
     migrate.init_app(app, db)
+    visit_log_writer.init_app(app)
+
+    from .cli import archive_visit_logs_command, partition_visit_logs_command
+    app.cli.add_command(archive_visit_logs_command)
+    app.cli.add_command(partition_visit_logs_command)
 
-    from .auth import bp, login_manager, user_allowed
+    from .auth import bp, login_manager, user_allowed, log_policy_cache_stats
     app.register_blueprint(bp)
     login_manager.init_app(app)
     app.jinja_env.globals['user_allowed'] = user_allowed
+    app.after_request(log_policy_cache_stats)
 
     from .users import bp, index
     app.register_blueprint(bp)
@@ -36,34 +58,23 @@ def create_app(test_config=None):
     app.errorhandler(SQLAlchemyError)(database_error)
     app.route('/', endpoint='index')(index)
 
-    from .repositories import get_repository
     from flask_login import current_user
-    import re
-    visit_log_repository = get_repository('visit_logs')
+    from .visit_filter import VisitPathFilter, DEFAULT_EXCLUDED_PATH_PATTERNS
 
-    app_endpoints = [rule.endpoint for rule in app.url_map.iter_rules()]
+    visit_filter = VisitPathFilter(
+        (rule.endpoint for rule in app.url_map.iter_rules()),
+        app.config.get('VISIT_LOG_EXCLUDED_PATHS', DEFAULT_EXCLUDED_PATH_PATTERNS)
+    )
 
     @app.before_request
     def log_visit():
         if request.method != 'GET':
             return
-        if request.endpoint not in app_endpoints:
+        if not visit_filter.should_log(request.endpoint, request.path):
             return
-        excluded_patterns = [
-            r'^/static/',
-            r'/delete$',
-            r'/logout$',
-            r'\.ico$',
-            r'\.css$',
-            r'\.js$',
-            r'\.png$|\.jpg$|\.gif$'
-        ]
-        for pattern in excluded_patterns:
-            if re.search(pattern, request.path):
-                return
         user_id = None
         if current_user.is_authenticated:
             user_id = current_user.id
-        visit_log_repository.create(request.path, user_id)
+        visit_log_writer.add(request.path, user_id)
 
     return app
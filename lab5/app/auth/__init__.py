@@ -1,4 +1,4 @@
-from flask import Blueprint, request, render_template, url_for, flash, redirect, session
+from flask import Blueprint, request, render_template, url_for, flash, redirect, session, g, current_app
 from flask_login import LoginManager, current_user, login_user, logout_user, login_required
 from functools import wraps
 from .checkers import check_password
@@ -7,6 +7,8 @@ from .policies.users_policy import UsersPolicy
 from .policies.visit_logs_policy import VisitLogsPolicy
 
 from ..repositories import get_repository
+from ..passwords import HasherBusyError
+from ..ratelimit import login_throttle
 
 policies = {
     'users': UsersPolicy,
@@ -39,8 +41,17 @@ def login():
         login = request.form.get('login')
         password = request.form.get('password')
         remember_me = request.form.get('remember_me') == 'on'
-        user = user_repository.validate_user(login, password)
+        retry_after = login_throttle.hit(request.remote_addr, login)
+        if retry_after:
+            flash(f'Слишком много попыток входа, повторите через {retry_after} с', 'danger')
+            return render_template('auth/auth.html'), 429, {'Retry-After': str(retry_after)}
+        try:
+            user = user_repository.validate_user(login, password)
+        except HasherBusyError:
+            flash('Сервер перегружен, попробуйте войти позже', 'danger')
+            return render_template('auth/auth.html'), 503
         if user is not None:
+            login_throttle.reset(login)
             login_user(user, remember=remember_me)
             flash('Вы успешно аутентифицированы', 'success')
             next_page = session.pop('next', None)
@@ -78,8 +89,26 @@ def change_password():
     return render_template('auth/change_password.html', form_passwords=form_passwords, errors=errors)
 
 def user_allowed(resource, action, **kwargs):
+    # Решения политик кэшируются на время запроса: шаблоны вызывают
+    # user_allowed для каждой строки таблицы с одними и теми же аргументами
+    user_id = current_user.get_id() if current_user.is_authenticated else None
+    key = (resource, action, tuple(sorted(kwargs.items())), user_id)
+    decisions = g.setdefault('policy_decisions', {})
+    if key in decisions:
+        g.policy_cache_hits = g.get('policy_cache_hits', 0) + 1
+        return decisions[key]
+    g.policy_cache_misses = g.get('policy_cache_misses', 0) + 1
     policy = policies[resource](**kwargs)
-    return getattr(policy, action, lambda: False)()
+    decisions[key] = getattr(policy, action, lambda: False)()
+    return decisions[key]
+
+def log_policy_cache_stats(response):
+    hits = g.get('policy_cache_hits', 0)
+    misses = g.get('policy_cache_misses', 0)
+    if hits or misses:
+        current_app.logger.info('%s %s: кэш политик доступа - %d попаданий, %d промахов',
+                                request.method, request.path, hits, misses)
+    return response
 
 def check_rights(resource, action):
     def decorator(function):
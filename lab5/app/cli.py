@@ -0,0 +1,35 @@
+import os
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .retention import (DEFAULT_ARCHIVE_BATCH_SIZE, DEFAULT_RETENTION_DAYS,
+                        archive_visit_logs, partition_visit_logs, retention_cutoff)
+
+@click.command('archive-visit-logs')
+@click.option('--days', type=int, default=None, help='Хранить в БД записи не старше указанного числа дней.')
+@click.option('--batch-size', type=int, default=None, help='Количество строк, удаляемых за одну транзакцию.')
+@click.option('--archive-dir', default=None, help='Каталог для сжатых файлов архива.')
+@with_appcontext
+def archive_visit_logs_command(days, batch_size, archive_dir):
+    """Archive visit logs older than the retention horizon and delete them."""
+    config = current_app.config
+    days = days if days is not None else config.get('VISIT_LOG_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    batch_size = batch_size or config.get('VISIT_LOG_ARCHIVE_BATCH_SIZE', DEFAULT_ARCHIVE_BATCH_SIZE)
+    archive_dir = archive_dir or config.get('VISIT_LOG_ARCHIVE_DIR') or \
+        os.path.join(current_app.instance_path, 'visit_logs_archive')
+    cutoff = retention_cutoff(days)
+    archived = archive_visit_logs(cutoff, archive_dir, batch_size)
+    click.echo(f'Archived {archived} visit logs older than {cutoff:%Y-%m-%d} to {archive_dir}.')
+
+@click.command('partition-visit-logs')
+@click.option('--months-ahead', type=int, default=3, help='На сколько месяцев вперёд создавать секции.')
+@with_appcontext
+def partition_visit_logs_command(months_ahead):
+    """Range-partition visit_logs by month (MySQL only)."""
+    statements = partition_visit_logs(months_ahead)
+    if not statements:
+        click.echo('Nothing to do: partitioning is only supported on MySQL or partitions are up to date.')
+    for statement in statements:
+        click.echo(statement)
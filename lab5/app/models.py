@@ -1,13 +1,14 @@
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, date
 import sqlalchemy
 from flask_login import UserMixin
 from flask import url_for
-from werkzeug.security import check_password_hash, generate_password_hash
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import  DeclarativeBase
 from sqlalchemy.orm import  Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey, DateTime, Text, Integer, MetaData
+from sqlalchemy import String, ForeignKey, DateTime, Date, Text, Integer, MetaData, Index
+
+from .passwords import hasher
 
 class Base(DeclarativeBase):
     metadata = MetaData(naming_convention={
@@ -53,10 +54,14 @@ class User(Base, UserMixin):
         return f"{self.last_name} {self.first_name} {self.middle_name or ''}".strip()
 
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        # Устаревший хэш заменяется новым, сохранить его должен вызывающий код
+        is_valid, new_hash = hasher.verify_and_update(self.password_hash, password)
+        if new_hash is not None:
+            self.password_hash = new_hash
+        return is_valid
 
 class VisitLog(Base):
     __tablename__ = 'visit_logs'
@@ -72,3 +77,25 @@ class VisitLog(Base):
     @property
     def created_at_formated(self):
         return self.created_at.strftime('%d.%m.%Y %H:%M:%S')
+
+# Индексы под сортировку журнала посещений: общий список и список одного пользователя
+Index('ix_visit_logs_created_at_user_id_id',
+      VisitLog.created_at.desc(), VisitLog.user_id, VisitLog.id.desc())
+Index('ix_visit_logs_user_id_created_at_id',
+      VisitLog.user_id, VisitLog.created_at.desc(), VisitLog.id.desc())
+
+class PageVisitsDaily(Base):
+    """Количество посещений страницы за день, обновляется при записи журнала"""
+    __tablename__ = 'page_visits_daily'
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    path: Mapped[str] = mapped_column(String(100), primary_key=True)
+    visit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+class UserVisitsDaily(Base):
+    """Количество посещений пользователя за день; user_id = 0 - неаутентифицированные посещения"""
+    __tablename__ = 'user_visits_daily'
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    visit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
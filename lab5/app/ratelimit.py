@@ -0,0 +1,4 @@
+from common.ratelimit import LoginThrottle
+
+# Свой экземпляр: настройки задаются в create_app через login_throttle.init_app
+login_throttle = LoginThrottle()
@@ -1,19 +1,73 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy, query
 from flask_sqlalchemy.extension import Pagination
+from flask_sqlalchemy.pagination import SelectPagination
 from sqlalchemy import func, select
 
-from typing import Optional, TypeVar, Type, List
+from typing import Optional, TypeVar, Type, List, Iterator, Callable, Hashable
 
-from io import BytesIO
+from io import StringIO
 from datetime import datetime
-import pandas as pd
-from pandas import DataFrame
+from threading import Lock
+import csv
+import time
 
 T = TypeVar('T')
 
+DEFAULT_COUNT_CACHE_TTL = 30
+DEFAULT_AGGREGATE_COUNT_TTL = 60
+CSV_YIELD_PER = 1000
+_MAX_CACHED_VALUES = 256
+_cache_lock = Lock()
+
+def cached_value(namespace: str, key: Hashable, ttl: float, compute: Callable[[], T]) -> T:
+    """Значение из кэша приложения или результат compute(), сохранённый на ttl секунд"""
+    values = current_app.extensions.setdefault(namespace, {})
+    now = time.monotonic()
+    with _cache_lock:
+        cached = values.get(key)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+    value = compute()
+    with _cache_lock:
+        if len(values) >= _MAX_CACHED_VALUES:
+            values.clear()
+        values[key] = (value, now + ttl)
+    return value
+
+class CachedCountPagination(SelectPagination):
+    """Постраничный вывод, в котором общее число строк кэшируется.
+
+    COUNT(*) по большой таблице выполняется не чаще раза в COUNT_CACHE_TTL
+    секунд для одного и того же запроса, поэтому в течение этого времени
+    total может немного отставать от действительного числа строк.
+    """
+    ttl_setting = 'COUNT_CACHE_TTL'
+    default_ttl = DEFAULT_COUNT_CACHE_TTL
+
+    def _query_count(self) -> int:
+        ttl = current_app.config.get(self.ttl_setting, self.default_ttl)
+        compiled = self._query_args['select'].compile()
+        key = (str(compiled), tuple(sorted(compiled.params.items())))
+        return cached_value('pagination_counts', key, ttl, super()._query_count)
+
+class AggregatePagination(CachedCountPagination):
+    """Страница агрегирующего запроса: строки (ключ, значение) возвращаются целиком.
+
+    Выполняется один запрос с LIMIT/OFFSET, а число групп кэшируется
+    на AGGREGATE_COUNT_CACHE_TTL секунд, поскольку меняется медленно.
+    """
+    ttl_setting = 'AGGREGATE_COUNT_CACHE_TTL'
+    default_ttl = DEFAULT_AGGREGATE_COUNT_TTL
+
+    def _query_items(self) -> List[tuple]:
+        select = self._query_args['select'].limit(self.per_page).offset(self._query_offset)
+        return [tuple(row) for row in self._query_args['session'].execute(select)]
+
 class BaseRepository:
     model: Type[T] = None
     order_by: tuple = None
+    cache_counts: bool = False
     
     def __init__(self, db_connector: SQLAlchemy):
         self.db_connector = db_connector
@@ -33,42 +87,49 @@ class BaseRepository:
             return pagination.items
         return self.db_connector.session.execute(self._get_all_query(order_by=order_by, **kwargs)).scalars().all()
 
-    def _complex_query_pagination(self, query: query) -> List:
-        pagination = self.db_connector.paginate(query)
-        all_items = self.db_connector.session.execute(query).all()
-        items_dict = {row[0]: row[1] for row in all_items}
-        items_paginated = []
-        for item in pagination.items:
-            if isinstance(item, str):
-                item_key = item
-            else:
-                item_key = item[0] if hasattr(item, '__getitem__') else str(item)
-            items_paginated.append((item_key, items_dict.get(item_key, 0)))
-        pagination.items = items_paginated
-        return pagination
-
-    def _get_table_pd(self, query: query, columns_renamed: Optional[List[str]] = None) -> DataFrame:
-        items = self.db_connector.session.execute(query).all()
-        table = DataFrame(items, columns=columns_renamed)
-        table.index = range(1, len(table) + 1)
-        table.index.name = '№'
-        return table
-
-    def _prepare_download_csv(self, table: DataFrame, filename_prefix: str) -> tuple[BytesIO, str]:
+    def _complex_query_pagination(self, query: query) -> AggregatePagination:
+        return AggregatePagination(select=query, session=self.db_connector.session)
+
+    def _iter_csv(self, query: query, columns: List[str]) -> Iterator[bytes]:
+        """CSV по строкам запроса: BOM и заголовок сразу, далее пачками по CSV_YIELD_PER строк.
+
+        Запрос выполняется до первого блока, поэтому его ошибки возникают при
+        получении заголовка, пока ответ ещё не начат (см. csv_response).
+        """
+        result = self.db_connector.session.execute(query, execution_options={'yield_per': CSV_YIELD_PER})
+        buffer = StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(['№', *columns])
+        yield '\ufeff'.encode('utf-8') + buffer.getvalue().encode('utf-8')
+        number = 0
+        try:
+            for rows in result.partitions():
+                buffer.seek(0)
+                buffer.truncate()
+                for row in rows:
+                    number += 1
+                    writer.writerow([number, *row])
+                yield buffer.getvalue().encode('utf-8')
+        except Exception:
+            # Статус ответа уже отправлен: ошибку остаётся только записать в журнал,
+            # а обрыв передачи покажет клиенту, что файл неполный
+            current_app.logger.exception('Ошибка при выгрузке CSV после %d строк', number)
+            raise
+        finally:
+            result.close()
+
+    def _prepare_download_csv(self, query: query, columns: List[str], filename_prefix: str) -> tuple[Iterator[bytes], str]:
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         filename = f"{filename_prefix}_{timestamp}.csv"
-        csv_string = table.to_csv(index=True)
-        buffer = BytesIO()
-        buffer.write('\ufeff'.encode('utf-8'))
-        buffer.write(csv_string.encode('utf-8'))
-        buffer.seek(0)
-        return buffer, filename
+        return self._iter_csv(query, columns), filename
 
     def get_pagination_info(self, sort: bool = False, query = None, **kwargs) -> Pagination:
         order_by = None
         if sort:
             order_by = self.order_by
         query = self._get_all_query(order_by=order_by, query=query, **kwargs)
+        if self.cache_counts:
+            return CachedCountPagination(select=query, session=self.db_connector.session)
         return self.db_connector.paginate(query)
 
     def rollback(self) -> None:
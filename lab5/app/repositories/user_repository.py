@@ -61,6 +61,9 @@ class UserRepository(BaseRepository):
     def validate_user(self, login: str, password: str) -> bool:
         user = self.get_by_login(login)
         if user and user.check_password(password):
+            # check_password мог обновить устаревший хэш пароля
+            if user in self.db_connector.session.dirty:
+                self.db_connector.session.commit()
             return user
         return None
 
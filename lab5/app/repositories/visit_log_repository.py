@@ -1,42 +1,209 @@
+from collections import Counter
+from datetime import datetime, date, timedelta
 from typing import Optional, List
 
-from .base_repository import Pagination, DataFrame, query
+from flask import current_app
+from sqlalchemy import insert, delete, update, and_, case, extract
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import IntegrityError
 
-from .base_repository import BaseRepository, func
-from ..models import VisitLog, User
+from .base_repository import Pagination, query
+
+from .base_repository import BaseRepository, func, cached_value
+from ..models import VisitLog, User, PageVisitsDaily, UserVisitsDaily
+
+GRANULARITIES = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+DEFAULT_TIMELINE_CACHE_TTL = 60
 
 class VisitLogsRepository(BaseRepository):
     model = VisitLog
     order_by = (VisitLog.created_at.desc(), VisitLog.user_id.asc(), VisitLog.id.desc())
+    cache_counts = True
 
-    @property
-    def _pages_visits_query(self) -> query:
+    @staticmethod
+    def _filter_days(query: query, day_column, date_from: Optional[date], date_to: Optional[date]) -> query:
+        if date_from is not None:
+            query = query.where(day_column >= date_from)
+        if date_to is not None:
+            query = query.where(day_column <= date_to)
+        return query
+
+    def _pages_visits_query(self, date_from: Optional[date] = None, date_to: Optional[date] = None) -> query:
+        visit_count = func.sum(PageVisitsDaily.visit_count)
         query = (
             self.db_connector.select(
-                VisitLog.path,
-                func.count(VisitLog.id).label('visit_count')
+                PageVisitsDaily.path,
+                visit_count.label('visit_count')
             )
-            .group_by(VisitLog.path)
-            .order_by(func.count(VisitLog.id).desc())
+            .group_by(PageVisitsDaily.path)
+            .order_by(visit_count.desc())
         )
-        return query
+        return self._filter_days(query, PageVisitsDaily.day, date_from, date_to)
 
-    @property
-    def _users_visits_query(self) -> query:
+    def _users_visits_query(self, date_from: Optional[date] = None, date_to: Optional[date] = None) -> query:
+        visit_count = func.sum(UserVisitsDaily.visit_count)
+        # Агрегаты хранят user_id и после удаления пользователя: все удалённые
+        # сворачиваются в одну строку, отдельно от неаутентифицированных (user_id = 0)
+        user_key = case(
+            (User.id.is_not(None), UserVisitsDaily.user_id),
+            (UserVisitsDaily.user_id == 0, 0),
+            else_=-1
+        )
+        full_name = case(
+            (User.id.is_not(None),
+             User.last_name + ' ' + User.first_name + ' ' + func.coalesce(User.middle_name, '')),
+            (UserVisitsDaily.user_id == 0, 'Неаутентифицированный пользователь'),
+            else_='Удалённый пользователь'
+        )
         query = (
             self.db_connector.select(
-                func.coalesce(
-                    func.concat(User.last_name, ' ', User.first_name, ' ', func.coalesce(User.middle_name, '')),
-                    'Неаутентифицированный пользователь'
-                ).label('full_name'),
-                func.count(VisitLog.id).label('visit_count')
+                full_name.label('full_name'),
+                visit_count.label('visit_count')
             )
-            .outerjoin(User, VisitLog.user_id == User.id)
-            .group_by(VisitLog.user_id)
-            .order_by(func.count(VisitLog.id).desc())
+            .select_from(UserVisitsDaily)
+            .outerjoin(User, UserVisitsDaily.user_id == User.id)
+            .group_by(user_key, full_name)
+            .order_by(visit_count.desc())
         )
+        return self._filter_days(query, UserVisitsDaily.day, date_from, date_to)
+
+    def _upsert_counts(self, model, rows: List[dict]) -> None:
+        if not rows:
+            return
+        table = model.__table__
+        dialect = self.db_connector.session.get_bind().dialect.name
+        if dialect == 'mysql':
+            statement = mysql.insert(table).values(rows)
+            statement = statement.on_duplicate_key_update(
+                visit_count=table.c.visit_count + statement.inserted.visit_count
+            )
+        elif dialect == 'sqlite':
+            statement = sqlite.insert(table).values(rows)
+            statement = statement.on_conflict_do_update(
+                index_elements=[column.name for column in table.primary_key],
+                set_={'visit_count': table.c.visit_count + statement.excluded.visit_count}
+            )
+        else:
+            self._increment_counts(table, rows)
+            return
+        self.db_connector.session.execute(statement)
+
+    def _increment_counts(self, table, rows: List[dict]) -> None:
+        """Переносимый вариант upsert: UPDATE, а для новых строк INSERT в точке сохранения"""
+        session = self.db_connector.session
+        keys = [column.name for column in table.primary_key]
+        for row in rows:
+            increment = (
+                update(table)
+                .where(and_(*(table.c[key] == row[key] for key in keys)))
+                .values(visit_count=table.c.visit_count + row['visit_count'])
+            )
+            if session.execute(increment).rowcount:
+                continue
+            try:
+                with session.begin_nested():
+                    session.execute(insert(table).values(row))
+            except IntegrityError:
+                # Строку успела вставить параллельная транзакция
+                session.execute(increment)
+
+    def _update_rollups(self, records: List[dict]) -> None:
+        # Агрегаты обновляются в той же транзакции, что и вставка журнала
+        pages = Counter((record['created_at'].date(), record['path']) for record in records)
+        users = Counter((record['created_at'].date(), record['user_id'] or 0) for record in records)
+        self._upsert_counts(PageVisitsDaily, [
+            {'day': day, 'path': path, 'visit_count': count} for (day, path), count in pages.items()
+        ])
+        self._upsert_counts(UserVisitsDaily, [
+            {'day': day, 'user_id': user_id, 'visit_count': count} for (day, user_id), count in users.items()
+        ])
+
+    @staticmethod
+    def _hour_bucket(dialect: str) -> tuple:
+        if dialect == 'mysql':
+            return (func.date_format(VisitLog.created_at, '%Y-%m-%d %H:00:00'),)
+        if dialect == 'sqlite':
+            return (func.strftime('%Y-%m-%d %H:00:00', VisitLog.created_at),)
+        # Переносимый вариант: день и час отдельными столбцами, склеиваются в get_visits_timeline
+        return func.date(VisitLog.created_at), extract('hour', VisitLog.created_at)
+
+    def _timeline_query(self, granularity: str, date_from: date, date_to: date,
+                        path_prefix: Optional[str], user_id: Optional[int]) -> query:
+        # Дневные и недельные ряды строятся по агрегатам, если хватает одного из них;
+        # почасовые и одновременно отфильтрованные по странице и пользователю - по журналу
+        if granularity != 'hour' and (path_prefix is None or user_id is None):
+            if user_id is not None:
+                model = UserVisitsDaily
+                query = self.db_connector.select(model.day, func.sum(model.visit_count)).where(model.user_id == user_id)
+            else:
+                model = PageVisitsDaily
+                query = self.db_connector.select(model.day, func.sum(model.visit_count))
+                if path_prefix is not None:
+                    query = query.where(model.path.startswith(path_prefix, autoescape=True))
+            query = self._filter_days(query, model.day, date_from, date_to)
+            return query.group_by(model.day)
+
+        if granularity == 'hour':
+            bucket = self._hour_bucket(self.db_connector.session.get_bind().dialect.name)
+        else:
+            bucket = (func.date(VisitLog.created_at),)
+        query = (
+            self.db_connector.select(*bucket, func.count(VisitLog.id))
+            .where(VisitLog.created_at >= datetime.combine(date_from, datetime.min.time()),
+                   VisitLog.created_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+            .group_by(*bucket)
+        )
+        if path_prefix is not None:
+            query = query.where(VisitLog.path.startswith(path_prefix, autoescape=True))
+        if user_id is not None:
+            query = query.where(VisitLog.user_id == user_id if user_id else VisitLog.user_id.is_(None))
         return query
 
+    def get_visits_timeline(self, granularity: str, date_from: date, date_to: date,
+                            path_prefix: Optional[str] = None, user_id: Optional[int] = None) -> List[tuple]:
+        """Количество посещений по интервалам (начало интервала, число посещений).
+
+        Пустые интервалы заполняются нулями, недели начинаются с понедельника,
+        user_id = 0 означает неаутентифицированные посещения. Результат
+        кэшируется на TIMELINE_CACHE_TTL секунд.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity '{granularity}'. Available: {list(GRANULARITIES)}")
+
+        def compute() -> List[tuple]:
+            counts = Counter()
+            query = self._timeline_query(granularity, date_from, date_to, path_prefix, user_id)
+            for *parts, visits in self.db_connector.session.execute(query):
+                bucket = parts[0]
+                if isinstance(bucket, str):
+                    bucket = datetime.fromisoformat(bucket)
+                elif not isinstance(bucket, datetime):
+                    bucket = datetime.combine(bucket, datetime.min.time())
+                if len(parts) > 1:
+                    bucket += timedelta(hours=int(parts[1]))
+                if granularity == 'week':
+                    bucket -= timedelta(days=bucket.weekday())
+                counts[bucket] += int(visits)
+
+            start = datetime.combine(date_from, datetime.min.time())
+            if granularity == 'week':
+                start -= timedelta(days=start.weekday())
+            end = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+            step = GRANULARITIES[granularity]
+            timeline = []
+            while start < end:
+                timeline.append((start, counts.get(start, 0)))
+                start += step
+            return timeline
+
+        ttl = current_app.config.get('TIMELINE_CACHE_TTL', DEFAULT_TIMELINE_CACHE_TTL)
+        key = (granularity, date_from, date_to, path_prefix, user_id)
+        return cached_value('visits_timeline', key, ttl, compute)
+
     def get_by_id(self, visit_log_id: int) -> Optional[VisitLog]:
         return self._get_one(id=visit_log_id)
 
@@ -50,29 +217,55 @@ class VisitLogsRepository(BaseRepository):
     def create(self, path: str, user_id: int = None) -> VisitLog:
         visit_log = VisitLog(
             path=path,
-            user_id=user_id
+            user_id=user_id,
+            created_at=datetime.now()
         )
         self.db_connector.session.add(visit_log)
+        self._update_rollups([{'path': path, 'user_id': user_id, 'created_at': visit_log.created_at}])
         self.db_connector.session.commit()
         return visit_log
 
-    def get_pages_visits_paged(self) -> tuple[Pagination, List[tuple]]:
-        pagination = self._complex_query_pagination(self._pages_visits_query)
+    def create_many(self, records: List[dict]) -> None:
+        if not records:
+            return
+        # Один INSERT ... VALUES (...), (...) вместо отдельного запроса на каждую запись
+        self.db_connector.session.execute(insert(VisitLog).values(records))
+        self._update_rollups(records)
+        self.db_connector.session.commit()
+
+    def get_older_than(self, cutoff: datetime, limit: int) -> List[VisitLog]:
+        query = (
+            self.db_connector.select(VisitLog)
+            .where(VisitLog.created_at < cutoff)
+            .order_by(VisitLog.id)
+            .limit(limit)
+        )
+        return self.db_connector.session.execute(query).scalars().all()
+
+    def delete_by_ids(self, ids: List[int]) -> int:
+        result = self.db_connector.session.execute(
+            delete(VisitLog).where(VisitLog.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        self.db_connector.session.commit()
+        return result.rowcount
+
+    def get_pages_visits_paged(self, date_from: Optional[date] = None,
+                               date_to: Optional[date] = None) -> tuple[Pagination, List[tuple]]:
+        pagination = self._complex_query_pagination(self._pages_visits_query(date_from, date_to))
         return pagination, pagination.items
 
-    def get_users_visits_paged(self) -> tuple[Pagination, List[tuple]]:
-        pagination = self._complex_query_pagination(self._users_visits_query)
+    def get_users_visits_paged(self, date_from: Optional[date] = None,
+                               date_to: Optional[date] = None) -> tuple[Pagination, List[tuple]]:
+        pagination = self._complex_query_pagination(self._users_visits_query(date_from, date_to))
         return pagination, pagination.items
 
-    def export_table(self, statistic_name: str):
+    def export_table(self, statistic_name: str, date_from: Optional[date] = None, date_to: Optional[date] = None):
         if statistic_name == "pages_visits":
-            query = self._pages_visits_query
+            query = self._pages_visits_query(date_from, date_to)
             columns = ['Страница', 'Количество посещений']
         elif statistic_name == "users_visits":
-            query = self._users_visits_query
+            query = self._users_visits_query(date_from, date_to)
             columns = ['Пользователь', 'Количество посещений']
         else:
             raise ValueError("Application doesn't have the representation for this statistic")
-        table = self._get_table_pd(query, columns)
-        buffered, filename = self._prepare_download_csv(table, statistic_name)
-        return buffered, filename
+        return self._prepare_download_csv(query, columns, statistic_name)
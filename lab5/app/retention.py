@@ -0,0 +1,115 @@
+import csv
+import gzip
+import os
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from typing import List
+
+from sqlalchemy import text
+
+from .models import db, VisitLog
+from .repositories import get_repository
+
+DEFAULT_RETENTION_DAYS = 180
+DEFAULT_ARCHIVE_BATCH_SIZE = 5000
+ARCHIVE_COLUMNS = ['id', 'path', 'created_at', 'user_id']
+
+def archive_path(archive_dir: str, day: date) -> str:
+    return os.path.join(archive_dir, f'visit_logs_{day.isoformat()}.csv.gz')
+
+def _write_archive(archive_dir: str, logs: List[VisitLog]) -> None:
+    os.makedirs(archive_dir, exist_ok=True)
+    for day, day_logs in groupby(sorted(logs, key=lambda log: (log.created_at, log.id)),
+                                 key=lambda log: log.created_at.date()):
+        path = archive_path(archive_dir, day)
+        is_new = not os.path.exists(path)
+        # Дозапись создаёт новый gzip-член, такой файл читается как единое целое
+        with gzip.open(path, 'at', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            if is_new:
+                writer.writerow(ARCHIVE_COLUMNS)
+            for log in day_logs:
+                writer.writerow([log.id, log.path, log.created_at.isoformat(sep=' '), log.user_id or ''])
+            f.flush()
+            os.fsync(f.fileno())
+
+def archive_visit_logs(cutoff: datetime, archive_dir: str, batch_size: int = DEFAULT_ARCHIVE_BATCH_SIZE) -> int:
+    """Перенести записи журнала старше cutoff в сжатые файлы по дням и удалить их из БД.
+
+    Удаление идёт пачками по batch_size строк в отдельных транзакциях,
+    чтобы не держать долгих блокировок. Строка удаляется только после того,
+    как она записана в архив. Агрегаты посещений (page_visits_daily,
+    user_visits_daily) не затрагиваются, поэтому статистика остаётся полной.
+    """
+    repository = get_repository('visit_logs')
+    archived = 0
+    while True:
+        logs = repository.get_older_than(cutoff, batch_size)
+        if not logs:
+            return archived
+        _write_archive(archive_dir, logs)
+        archived += repository.delete_by_ids([log.id for log in logs])
+        db.session.expunge_all()
+
+def _month_start(day: date, months: int = 0) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+def _partition_clause(start: date) -> str:
+    upper = _month_start(start, 1)
+    return f"PARTITION p{start:%Y%m} VALUES LESS THAN (TO_DAYS('{upper.isoformat()}'))"
+
+def partition_visit_logs(months_ahead: int = 3) -> List[str]:
+    """Разбить visit_logs на помесячные RANGE-секции (только MySQL).
+
+    При первом запуске первичный ключ расширяется до (id, created_at),
+    а внешний ключ на users удаляется: секционированные таблицы InnoDB
+    их не поддерживают. Повторный запуск добавляет недостающие секции
+    на months_ahead месяцев вперёд, отделяя их от секции pmax.
+    Возвращает выполненные SQL-команды; для других СУБД ничего не делает.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name != 'mysql':
+        return []
+
+    existing = set(connection.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'visit_logs' AND PARTITION_NAME IS NOT NULL"
+    )).scalars())
+    last = _month_start(date.today(), months_ahead)
+    monthly = [datetime.strptime(name[1:], '%Y%m').date() for name in existing if name != 'pmax']
+    if monthly:
+        start = _month_start(max(monthly), 1)
+    elif existing:
+        start = _month_start(date.today())
+    else:
+        oldest = connection.execute(text('SELECT MIN(created_at) FROM visit_logs')).scalar()
+        start = _month_start(oldest.date() if oldest else date.today())
+
+    months = []
+    while start <= last:
+        months.append(_partition_clause(start))
+        start = _month_start(start, 1)
+    months.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+
+    statements = []
+    if not existing:
+        fk_names = connection.execute(text(
+            "SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'visit_logs' AND CONSTRAINT_TYPE = 'FOREIGN KEY'"
+        )).scalars().all()
+        statements += [f'ALTER TABLE visit_logs DROP FOREIGN KEY {name}' for name in fk_names]
+        statements.append('ALTER TABLE visit_logs DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)')
+        statements.append('ALTER TABLE visit_logs PARTITION BY RANGE (TO_DAYS(created_at)) ('
+                          + ', '.join(months) + ')')
+    elif len(months) > 1:
+        statements.append('ALTER TABLE visit_logs REORGANIZE PARTITION pmax INTO ('
+                          + ', '.join(months) + ')')
+
+    for statement in statements:
+        connection.execute(text(statement))
+    db.session.commit()
+    return statements
+
+def retention_cutoff(days: int) -> datetime:
+    return datetime.combine(date.today() - timedelta(days=days), datetime.min.time())
@@ -1,9 +1,13 @@
 import pytest
 
 from .. import create_app
-from ..models import db, User, Role, VisitLog
+from ..models import db, User, Role, VisitLog, PageVisitsDaily, UserVisitsDaily
+from ..auth import user_allowed
 from ..auth.checkers import check_login, check_password
 from ..config import SECRET_KEY
+from ..repositories.visit_log_repository import VisitLogsRepository
+from ..visit_log_writer import VisitLogWriter
+from ..visit_filter import VisitPathFilter
 
 
 @pytest.fixture
@@ -121,6 +125,45 @@ def test_login_valid_user(client, regular_user):
     assert 'успешно аутентифицированы' in response.get_data(as_text=True)
 
 
+def test_login_rehashes_outdated_password_hash(app, client, regular_user):
+    from werkzeug.security import generate_password_hash
+    from ..passwords import hasher
+
+    with app.app_context():
+        user = db.session.get(User, 2)
+        user.password_hash = generate_password_hash(regular_user['password'], 'pbkdf2:sha256:1000')
+        db.session.commit()
+
+    response = client.post('/auth/login', data=regular_user, follow_redirects=True)
+    assert 'успешно аутентифицированы' in response.get_data(as_text=True)
+
+    with app.app_context():
+        password_hash = db.session.get(User, 2).password_hash
+    assert not hasher.needs_rehash(password_hash)
+    assert hasher.verify(password_hash, regular_user['password'])
+
+
+def test_login_throttle_shared_between_workers(app, client, tmp_path):
+    from ..ratelimit import LoginThrottle, login_throttle
+
+    app.config.update(LOGIN_THROTTLE_STORAGE=f"sqlite:///{tmp_path / 'throttle.db'}",
+                      LOGIN_THROTTLE_LOGIN_CAPACITY=2)
+    login_throttle.init_app(app)
+    # Второй рабочий процесс с тем же файлом видит те же корзины
+    other_worker = LoginThrottle(app)
+    assert other_worker.hit('10.0.0.1', 'admin') == 0
+    assert other_worker.hit('10.0.0.2', 'admin') == 0
+
+    response = client.post('/auth/login', data={'login': 'admin', 'password': 'admin123'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert 'Слишком много попыток входа' in response.get_data(as_text=True)
+
+    other_worker.reset('admin')
+    response = client.post('/auth/login', data={'login': 'admin', 'password': 'admin123'})
+    assert response.status_code == 302
+
+
 def test_login_invalid_credentials(client):
     response = client.post('/auth/login', data={
         'login': 'wronguser',
@@ -455,3 +498,416 @@ def test_example_mocking_password_hashing(client, admin_user, mocker):
     })
     
     mock_hash.assert_called_once_with('TestPassword123!')
+
+
+def test_user_allowed_caches_decisions_per_request(app, mocker):
+    from ..auth.policies.visit_logs_policy import VisitLogsPolicy
+    spy = mocker.spy(VisitLogsPolicy, 'show_all')
+
+    with app.test_request_context('/visit_logs/'):
+        from flask import g
+        results = [user_allowed('visit_logs', 'show_all') for _ in range(50)]
+        assert results == [False] * 50
+        assert spy.call_count == 1
+        assert g.policy_cache_misses == 1
+        assert g.policy_cache_hits == 49
+
+    with app.test_request_context('/visit_logs/'):
+        user_allowed('visit_logs', 'show_all')
+        assert spy.call_count == 2
+
+
+def test_buffered_visit_log_writer_flushes_in_batches(app, mocker):
+    app.config.update(VISIT_LOG_BUFFERED=True, VISIT_LOG_BATCH_SIZE=5, VISIT_LOG_FLUSH_INTERVAL=60)
+    writer = VisitLogWriter(app)
+    create_many = mocker.spy(VisitLogsRepository, 'create_many')
+    for i in range(12):
+        writer.add(f'/page/{i}', 1)
+    writer.stop()
+
+    assert [len(call.args[1]) for call in create_many.call_args_list] == [5, 5, 2]
+    with app.app_context():
+        assert db.session.query(VisitLog).filter(VisitLog.path.like('/page/%')).count() == 12
+
+
+def test_buffered_visit_log_writer_drops_on_overflow(app, mocker):
+    app.config.update(VISIT_LOG_BUFFERED=True, VISIT_LOG_QUEUE_SIZE=2)
+    writer = VisitLogWriter(app)
+    mocker.patch.object(writer, '_ensure_started')
+    for i in range(5):
+        writer.add(f'/page/{i}')
+    assert writer.dropped == 3
+
+
+def test_buffered_visit_log_writer_stop_does_not_block_on_full_queue(app, mocker):
+    import threading
+    import time
+    from ..visit_log_writer import _STOP
+    app.config.update(VISIT_LOG_BUFFERED=True, VISIT_LOG_BATCH_SIZE=1, VISIT_LOG_QUEUE_SIZE=3)
+    writer = VisitLogWriter(app)
+    flushing, release = threading.Event(), threading.Event()
+
+    def hanging_flush(batch):
+        # Как при недоступной БД: сохранение пачки висит на таймаутах подключения
+        flushing.set()
+        release.wait()
+
+    mocker.patch.object(writer, '_flush', side_effect=hanging_flush)
+    warning = mocker.patch.object(app.logger, 'warning')
+    writer.add('/page/0')
+    assert flushing.wait(1)
+    for i in range(1, 4):
+        writer.add(f'/page/{i}')
+    assert writer._queue.full()
+
+    thread = writer._thread
+    started = time.monotonic()
+    writer.stop(timeout=0.2)
+    assert time.monotonic() - started < 1
+    assert writer.dropped == 3
+    assert warning.call_args.args[-1] == 3
+
+    # Отпускаем поток, чтобы он не пережил тест
+    release.set()
+    writer._queue.put(_STOP)
+    thread.join(1)
+    assert not thread.is_alive()
+
+
+def test_visit_path_filter():
+    visit_filter = VisitPathFilter(['index', 'static', 'users.delete', 'users.index'])
+    assert visit_filter.should_log('users.index', '/users/')
+    assert not visit_filter.should_log('static', '/static/styles.css')
+    assert not visit_filter.should_log('users.delete', '/users/3/delete')
+    assert not visit_filter.should_log(None, '/missing')
+    assert VisitPathFilter(['static'], excluded_patterns=[]).should_log('static', '/static/app.js')
+
+
+def test_visit_logging_excluded_paths_are_configurable(app):
+    app = create_app({**app.config, 'VISIT_LOG_EXCLUDED_PATHS': [r'^/auth/']})
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    client.get('/auth/login')
+    client.get('/users/')
+    with app.app_context():
+        assert [log.path for log in db.session.query(VisitLog)] == ['/users/']
+
+
+def test_analytics_poll_is_not_logged(client, admin_user, app):
+    client.post('/auth/login', data=admin_user)
+    for _ in range(3):
+        assert client.get('/visit_logs/analytics').status_code == 200
+    with app.app_context():
+        assert db.session.query(VisitLog).filter(VisitLog.path.like('/visit_logs/analytics%')).count() == 0
+        assert db.session.query(PageVisitsDaily).filter(PageVisitsDaily.path.like('/visit_logs/analytics%')).count() == 0
+
+
+def test_visit_rollups_are_updated_on_write(app):
+    from datetime import datetime
+    from ..repositories import get_repository
+    with app.app_context():
+        repository = get_repository('visit_logs')
+        repository.create('/users/', 1)
+        repository.create_many([
+            {'path': '/users/', 'user_id': None, 'created_at': datetime(2025, 1, 10, 12)},
+            {'path': '/users/', 'user_id': 1, 'created_at': datetime(2025, 1, 10, 13)},
+            {'path': '/visit_logs/', 'user_id': 1, 'created_at': datetime(2025, 1, 11, 9)},
+        ])
+        repository.create_many([{'path': '/users/', 'user_id': 1, 'created_at': datetime(2025, 1, 10, 14)}])
+
+        assert db.session.get(PageVisitsDaily, (datetime(2025, 1, 10).date(), '/users/')).visit_count == 3
+        assert db.session.get(UserVisitsDaily, (datetime(2025, 1, 10).date(), 0)).visit_count == 1
+        assert db.session.get(UserVisitsDaily, (datetime(2025, 1, 10).date(), 1)).visit_count == 2
+
+        _, pages = repository.get_pages_visits_paged()
+        assert [tuple(row) for row in pages] == [('/users/', 4), ('/visit_logs/', 1)]
+        _, pages = repository.get_pages_visits_paged(date_from=datetime(2025, 1, 11).date(),
+                                                     date_to=datetime(2025, 1, 11).date())
+        assert [tuple(row) for row in pages] == [('/visit_logs/', 1)]
+
+
+def test_rollup_generic_upsert(app):
+    from datetime import date
+    from ..repositories import get_repository
+    with app.app_context():
+        repository = get_repository('visit_logs')
+        table = PageVisitsDaily.__table__
+        repository._increment_counts(table, [{'day': date(2025, 1, 10), 'path': '/users/', 'visit_count': 2}])
+        repository._increment_counts(table, [
+            {'day': date(2025, 1, 10), 'path': '/users/', 'visit_count': 3},
+            {'day': date(2025, 1, 11), 'path': '/users/', 'visit_count': 1},
+        ])
+        db.session.commit()
+        assert db.session.get(PageVisitsDaily, (date(2025, 1, 10), '/users/')).visit_count == 5
+        assert db.session.get(PageVisitsDaily, (date(2025, 1, 11), '/users/')).visit_count == 1
+
+
+def test_users_visits_fold_deleted_users(app):
+    from datetime import datetime
+    from ..repositories import get_repository
+    with app.app_context():
+        for user_id in (3, 4):
+            user = User(id=user_id, login=f'gone{user_id}', first_name='Имя', last_name='Фамилия', role_id=2)
+            user.set_password('Password1')
+            db.session.add(user)
+        db.session.commit()
+        repository = get_repository('visit_logs')
+        repository.create_many([
+            {'path': '/users/', 'user_id': user_id, 'created_at': datetime(2025, 1, 10, 12)}
+            for user_id in (None, 1, 3, 3, 4)
+        ])
+        # Журнал удаляемых пользователей очищается, агрегаты остаются
+        db.session.execute(db.delete(VisitLog).where(VisitLog.user_id.in_([3, 4])))
+        db.session.execute(db.delete(User).where(User.id.in_([3, 4])))
+        db.session.commit()
+
+        _, users = repository.get_users_visits_paged()
+        assert sorted(tuple(row) for row in users) == sorted([
+            ('Удалённый пользователь', 3),
+            ('Администратор Админ Главный', 1),
+            ('Неаутентифицированный пользователь', 1),
+        ])
+
+
+def test_statistics_date_range_filter(client, admin_user, app):
+    from datetime import datetime
+    from ..repositories import get_repository
+    with app.app_context():
+        get_repository('visit_logs').create_many([
+            {'path': '/old-page', 'user_id': 1, 'created_at': datetime(2024, 5, 1)},
+            {'path': '/new-page', 'user_id': 1, 'created_at': datetime(2025, 5, 1)},
+        ])
+    client.post('/auth/login', data=admin_user)
+    response = client.get('/visit_logs/pages_visits?date_from=2025-01-01&date_to=bad-date')
+    text = response.get_data(as_text=True)
+    assert '/new-page' in text
+    assert '/old-page' not in text
+    assert 'date_from=2025-01-01' in text
+
+    response = client.get('/visit_logs/pages_visits/download?date_to=2024-12-31')
+    csv = response.get_data(as_text=True)
+    assert '/old-page' in csv
+    assert '/new-page' not in csv
+
+
+def test_statistics_page_runs_aggregate_once_and_caches_count(app):
+    from datetime import datetime
+    from sqlalchemy import event
+    from ..repositories import get_repository
+    statements = []
+    with app.app_context():
+        repository = get_repository('visit_logs')
+        repository.create_many([
+            {'path': f'/page/{i % 25}', 'user_id': 1, 'created_at': datetime(2023, 3, 1)} for i in range(100)
+        ])
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    for expected in (2, 1):
+        statements.clear()
+        with app.test_request_context('/visit_logs/pages_visits?page=2&per_page=10'):
+            pagination, pages = repository.get_pages_visits_paged(date_from=datetime(2023, 3, 1).date(),
+                                                                 date_to=datetime(2023, 3, 1).date())
+        assert len(statements) == expected
+        assert pagination.total == 25
+        assert len(pages) == 10
+        assert all(count == 4 for _, count in pages)
+
+
+def test_statistics_csv_is_streamed(client, admin_user, app, mocker):
+    from datetime import datetime
+    from ..repositories import get_repository
+    from ..repositories import base_repository
+    mocker.patch.object(base_repository, 'CSV_YIELD_PER', 2)
+    with app.app_context():
+        get_repository('visit_logs').create_many([
+            {'path': f'/page/{i}', 'user_id': 1, 'created_at': datetime(2022, 1, 1)} for i in range(5)
+        ])
+    client.post('/auth/login', data=admin_user)
+    response = client.get('/visit_logs/pages_visits/download?date_to=2022-12-31')
+    assert response.is_streamed
+    assert response.headers['Content-Disposition'].startswith('attachment; filename=pages_visits_')
+    lines = response.get_data().decode('utf-8').split('\n')
+    assert lines[0] == '\ufeff№,Страница,Количество посещений'
+    rows = [line.split(',') for line in lines[1:-1]]
+    assert [row[0] for row in rows] == ['1', '2', '3', '4', '5']
+    assert sorted(row[1] for row in rows) == [f'/page/{i}' for i in range(5)]
+    assert lines[-1] == ''
+
+
+def patch_csv_execute(mocker, result):
+    # Подменяется только запрос выгрузки (с yield_per), остальные запросы выполняются как обычно
+    from sqlalchemy.orm import Session
+    execute = Session.execute
+
+    def fake_execute(session, statement, *args, **kwargs):
+        if 'yield_per' not in (kwargs.get('execution_options') or {}):
+            return execute(session, statement, *args, **kwargs)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    mocker.patch.object(Session, 'execute', fake_execute)
+
+
+def test_statistics_csv_query_error_redirects(client, admin_user, mocker):
+    from sqlalchemy.exc import OperationalError
+    client.post('/auth/login', data=admin_user)
+    patch_csv_execute(mocker, OperationalError('SELECT', {}, Exception('gone')))
+    response = client.get('/visit_logs/pages_visits/download')
+    assert response.status_code == 302
+    assert response.location.endswith('/visit_logs/pages_visits')
+
+
+def test_statistics_csv_error_mid_stream_is_logged(client, admin_user, app, mocker):
+    class BrokenResult:
+        closed = False
+
+        def partitions(self):
+            yield [('/page/1', 1)]
+            raise RuntimeError('connection lost')
+
+        def close(self):
+            self.closed = True
+
+    client.post('/auth/login', data=admin_user)
+    result = BrokenResult()
+    patch_csv_execute(mocker, result)
+    log = mocker.patch.object(app.logger, 'exception')
+    response = client.get('/visit_logs/pages_visits/download')
+    assert response.status_code == 200
+    with pytest.raises(RuntimeError):
+        response.get_data()
+    log.assert_called_once()
+    assert result.closed
+
+def test_archive_visit_logs_command(app, tmp_path):
+    import csv
+    import gzip
+    from datetime import datetime, timedelta
+    from ..repositories import get_repository
+    old = datetime.now() - timedelta(days=40)
+    with app.app_context():
+        get_repository('visit_logs').create_many(
+            [{'path': f'/old/{i}', 'user_id': 1 if i % 2 else None, 'created_at': old} for i in range(7)]
+            + [{'path': '/recent', 'user_id': 1, 'created_at': datetime.now()}]
+        )
+
+    result = app.test_cli_runner().invoke(args=[
+        'archive-visit-logs', '--days', '30', '--batch-size', '3', '--archive-dir', str(tmp_path)
+    ])
+    assert 'Archived 7 visit logs' in result.output
+
+    with gzip.open(tmp_path / f'visit_logs_{old.date().isoformat()}.csv.gz', 'rt', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['id', 'path', 'created_at', 'user_id']
+    assert sorted(row[1] for row in rows[1:]) == [f'/old/{i}' for i in range(7)]
+    with app.app_context():
+        assert [log.path for log in db.session.query(VisitLog)] == ['/recent']
+        assert db.session.get(PageVisitsDaily, (old.date(), '/old/0')).visit_count == 1
+
+
+def test_partition_visit_logs_is_noop_on_sqlite(app):
+    result = app.test_cli_runner().invoke(args=['partition-visit-logs'])
+    assert result.exit_code == 0
+    assert 'only supported on MySQL' in result.output
+
+
+def test_visit_log_listing_uses_index_and_caches_count(client, regular_user, app):
+    from sqlalchemy import event, text
+    with app.app_context():
+        db.session.add_all([VisitLog(path=f'/page/{i}', user_id=2) for i in range(30)])
+        db.session.commit()
+        plan = db.session.execute(text(
+            'EXPLAIN QUERY PLAN SELECT * FROM visit_logs WHERE user_id = 2 ORDER BY created_at DESC, id DESC'
+        )).all()
+        assert 'ix_visit_logs_user_id_created_at_id' in str(plan)
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    client.post('/auth/login', data=regular_user)
+    for _ in range(2):
+        response = client.get('/visit_logs/?page=2')
+        assert response.status_code == 200
+    assert sum('count(*)' in statement.lower() for statement in statements) == 1
+
+
+@pytest.fixture
+def timeline_logs(app):
+    from datetime import datetime
+    from ..repositories import get_repository
+    with app.app_context():
+        get_repository('visit_logs').create_many([
+            {'path': '/users/1', 'user_id': 1, 'created_at': datetime(2025, 3, 3, 10, 15)},
+            {'path': '/users/2', 'user_id': None, 'created_at': datetime(2025, 3, 3, 10, 45)},
+            {'path': '/users/2', 'user_id': 2, 'created_at': datetime(2025, 3, 3, 12, 5)},
+            {'path': '/visit_logs/', 'user_id': 1, 'created_at': datetime(2025, 3, 5, 9, 0)},
+            {'path': '/users/1', 'user_id': 1, 'created_at': datetime(2025, 3, 11, 9, 0)},
+        ])
+
+
+def test_analytics_daily_and_weekly_buckets(client, admin_user, timeline_logs):
+    client.post('/auth/login', data=admin_user)
+    data = client.get('/visit_logs/analytics?date_from=2025-03-03&date_to=2025-03-05').get_json()
+    assert data['granularity'] == 'day'
+    assert data['buckets'] == [
+        {'start': '2025-03-03T00:00:00', 'visits': 3},
+        {'start': '2025-03-04T00:00:00', 'visits': 0},
+        {'start': '2025-03-05T00:00:00', 'visits': 1},
+    ]
+
+    data = client.get('/visit_logs/analytics?granularity=week&date_from=2025-03-03&date_to=2025-03-16'
+                      '&path_prefix=/users/').get_json()
+    assert data['buckets'] == [
+        {'start': '2025-03-03T00:00:00', 'visits': 3},
+        {'start': '2025-03-10T00:00:00', 'visits': 1},
+    ]
+
+    data = client.get('/visit_logs/analytics?date_from=2025-03-03&date_to=2025-03-03&user_id=0').get_json()
+    assert data['total'] == 1
+
+
+def test_analytics_hourly_buckets_from_log(client, admin_user, timeline_logs):
+    client.post('/auth/login', data=admin_user)
+    data = client.get('/visit_logs/analytics?granularity=hour&date_from=2025-03-03&date_to=2025-03-03'
+                      '&path_prefix=/users/&user_id=1').get_json()
+    assert len(data['buckets']) == 24
+    assert [bucket for bucket in data['buckets'] if bucket['visits']] == [
+        {'start': '2025-03-03T10:00:00', 'visits': 1},
+    ]
+
+
+def test_analytics_hourly_buckets_generic_dialect(app, timeline_logs, mocker):
+    from datetime import date, datetime
+    from ..repositories import get_repository
+    hour_bucket = VisitLogsRepository._hour_bucket
+    mocker.patch.object(VisitLogsRepository, '_hour_bucket', staticmethod(lambda dialect: hour_bucket('postgresql')))
+    with app.app_context():
+        buckets = get_repository('visit_logs').get_visits_timeline('hour', date(2025, 3, 3), date(2025, 3, 3))
+    assert [bucket for bucket in buckets if bucket[1]] == [
+        (datetime(2025, 3, 3, 10), 2),
+        (datetime(2025, 3, 3, 12), 1),
+    ]
+
+
+def test_analytics_validation_and_access(client, admin_user, regular_user):
+    client.post('/auth/login', data=admin_user)
+    assert client.get('/visit_logs/analytics?granularity=month').status_code == 400
+    assert client.get('/visit_logs/analytics?date_from=2025-03-05&date_to=2025-03-01').status_code == 400
+    assert client.get('/visit_logs/analytics?granularity=hour&date_from=2020-01-01&date_to=2025-01-01').status_code == 400
+    client.get('/auth/logout')
+    client.post('/auth/login', data=regular_user)
+    assert client.get('/visit_logs/analytics').status_code == 302
+
+
+def test_analytics_results_are_cached(app, timeline_logs, mocker):
+    from datetime import date
+    from ..repositories import get_repository
+    repository = get_repository('visit_logs')
+    timeline_query = mocker.spy(repository, '_timeline_query')
+    with app.app_context():
+        first = repository.get_visits_timeline('day', date(2025, 3, 1), date(2025, 3, 31))
+        second = repository.get_visits_timeline('day', date(2025, 3, 1), date(2025, 3, 31))
+    assert first == second
+    assert timeline_query.call_count == 1
+
@@ -0,0 +1,33 @@
+import re
+from typing import Iterable, Optional
+
+# Пути, посещения которых не записываются в журнал
+DEFAULT_EXCLUDED_PATH_PATTERNS = (
+    r'^/static/',
+    r'/delete$',
+    r'/logout$',
+    r'\.ico$',
+    r'\.css$',
+    r'\.js$',
+    r'\.png$|\.jpg$|\.gif$',
+    # Дашборд опрашивает аналитику по таймеру: иначе каждый опрос сам становился бы посещением
+    r'^/visit_logs/analytics$',
+)
+
+class VisitPathFilter:
+    """Определяет, нужно ли записывать посещение страницы.
+
+    Строится один раз при создании приложения: эндпоинты хранятся в множестве,
+    а шаблоны исключений объединяются в одно скомпилированное регулярное выражение,
+    поэтому проверка запроса не зависит от их количества.
+    """
+
+    def __init__(self, endpoints: Iterable[str], excluded_patterns: Iterable[str] = DEFAULT_EXCLUDED_PATH_PATTERNS):
+        self.endpoints = frozenset(endpoints)
+        patterns = list(excluded_patterns)
+        self.excluded = re.compile('|'.join(f'(?:{pattern})' for pattern in patterns)) if patterns else None
+
+    def should_log(self, endpoint: Optional[str], path: str) -> bool:
+        if endpoint not in self.endpoints:
+            return False
+        return self.excluded is None or self.excluded.search(path) is None
@@ -0,0 +1,135 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from flask import Flask
+
+from .repositories import get_repository
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_QUEUE_SIZE = 10000
+OVERFLOW_POLICIES = ('drop', 'block')
+
+_STOP = object()
+
+class VisitLogWriter:
+    """Буферизованная запись журнала посещений.
+
+    Записи складываются в ограниченную очередь и сохраняются фоновым потоком
+    пачками по VISIT_LOG_BATCH_SIZE штук или раз в VISIT_LOG_FLUSH_INTERVAL
+    секунд одним многострочным INSERT. При переполнении очереди запись
+    отбрасывается ('drop') либо запрос ждёт освобождения места не дольше
+    VISIT_LOG_PUT_TIMEOUT секунд ('block'). При завершении процесса остаток
+    очереди сохраняется. Если VISIT_LOG_BUFFERED выключен (по умолчанию
+    в режиме тестирования), каждая запись сохраняется сразу.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.app = None
+        self.dropped = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.stop)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        self.stop()
+        self.app = app
+        self.buffered = app.config.get('VISIT_LOG_BUFFERED', not app.testing)
+        self.batch_size = app.config.get('VISIT_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.flush_interval = app.config.get('VISIT_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        self.overflow = app.config.get('VISIT_LOG_OVERFLOW', 'drop')
+        self.put_timeout = app.config.get('VISIT_LOG_PUT_TIMEOUT', 0.05)
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"VISIT_LOG_OVERFLOW must be one of {OVERFLOW_POLICIES}, got '{self.overflow}'")
+        self._queue = queue.Queue(maxsize=app.config.get('VISIT_LOG_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+
+    def add(self, path: str, user_id: Optional[int] = None) -> None:
+        if not self.buffered:
+            get_repository('visit_logs').create(path, user_id)
+            return
+        self._ensure_started()
+        record = {'path': path, 'user_id': user_id, 'created_at': datetime.now()}
+        try:
+            if self.overflow == 'block':
+                self._queue.put(record, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                self.app.logger.warning('Очередь журнала посещений переполнена, отброшено записей: %d',
+                                        self.dropped)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Сохранить оставшиеся записи и остановить фоновый поток.
+
+        Ждёт не дольше timeout секунд в сумме, даже если очередь полна, а БД
+        недоступна; то, что не успело сохраниться, теряется и попадает в журнал.
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+            stop_queued = True
+        except queue.Full:
+            stop_queued = False
+        thread.join(max(deadline - time.monotonic(), 0))
+        if thread.is_alive():
+            # Поток демонический и завершится вместе с процессом; запись, которую
+            # он сейчас сохраняет, тоже может не успеть
+            lost = max(self._queue.qsize() - stop_queued, 0)
+            self.dropped += lost
+            self.app.logger.warning('Журнал посещений не сохранён за %.1f с при остановке, '
+                                    'отброшено записей из очереди: %d', timeout, lost)
+        self._thread = None
+
+    def _ensure_started(self) -> None:
+        # После fork (например, в воркерах gunicorn) поток родителя не существует
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='visit-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                record = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                record = None
+            if record is _STOP:
+                self._flush(batch)
+                return
+            if record is not None:
+                batch.append(record)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, batch: List[dict]) -> None:
+        if not batch:
+            return
+        with self.app.app_context():
+            repository = get_repository('visit_logs')
+            try:
+                repository.create_many(batch)
+            except Exception:
+                repository.rollback()
+                self.app.logger.exception('Не удалось сохранить %d записей журнала посещений', len(batch))
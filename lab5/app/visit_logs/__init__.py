@@ -1,13 +1,33 @@
-from flask import Blueprint, flash, redirect, render_template, request, send_file, url_for
+from datetime import date, timedelta
+from itertools import chain
+
+from flask import Blueprint, Response, flash, jsonify, redirect, render_template, request, stream_with_context, url_for
 from flask_login import current_user, login_required
 
 from ..repositories import get_repository
+from ..repositories.visit_log_repository import GRANULARITIES
 from ..auth import check_rights, user_allowed
 
 visit_log_repository = get_repository('visit_logs')
 
 bp = Blueprint('visit_logs', __name__, url_prefix='/visit_logs')
 
+ANALYTICS_DEFAULT_DAYS = 7
+ANALYTICS_MAX_BUCKETS = 2000
+
+def date_range() -> dict:
+    # Некорректные даты игнорируются, а не приводят к ошибке
+    return {name: request.args.get(name, type=date.fromisoformat) for name in ('date_from', 'date_to')}
+
+def csv_response(rows, filename: str) -> Response:
+    # Файл отдаётся по мере чтения строк из БД, не собираясь целиком в памяти.
+    # Первый блок (с выполнением запроса) берётся сразу, чтобы ошибка запроса
+    # попала в обработчик представления, а не возникла посреди ответа
+    rows = iter(rows)
+    first_chunk = next(rows, b'')
+    return Response(stream_with_context(chain([first_chunk], rows)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
 @bp.route('/')
 @login_required
 def index():
@@ -25,23 +45,20 @@ def index():
 @login_required
 @check_rights('visit_logs', 'show_statistics_page')
 def pages_visits():
-    pagination, pages_visits = visit_log_repository.get_pages_visits_paged()
+    period = date_range()
+    pagination, pages_visits = visit_log_repository.get_pages_visits_paged(**period)
     return render_template('visit_logs/pages_visits.html',
                             pagination=pagination,
-                            pages_visits=pages_visits)
+                            pages_visits=pages_visits,
+                            period={name: value for name, value in period.items() if value})
 
 @bp.route('/pages_visits/download')
 @login_required
 @check_rights('visit_logs', 'show_statistics_page')
 def download_pages_visits():
     try:
-        buffer, filename = visit_log_repository.export_table('pages_visits')
-        return send_file(
-            buffer, 
-            as_attachment=True, 
-            download_name=filename,
-            mimetype='text/csv'
-        )
+        rows, filename = visit_log_repository.export_table('pages_visits', **date_range())
+        return csv_response(rows, filename)
     except Exception as e:
         flash(f"Error generating CSV: {str(e)}", 'danger')
         return redirect(url_for('visit_logs.pages_visits'))
@@ -50,23 +67,49 @@ def download_pages_visits():
 @login_required
 @check_rights('visit_logs', 'show_statistics_page')
 def users_visits():
-    pagination, users_visits = visit_log_repository.get_users_visits_paged()
+    period = date_range()
+    pagination, users_visits = visit_log_repository.get_users_visits_paged(**period)
     return render_template('visit_logs/users_visits.html',
                             pagination=pagination,
-                            users_visits=users_visits)
+                            users_visits=users_visits,
+                            period={name: value for name, value in period.items() if value})
 
 @bp.route('/users_visits/download')
 @login_required
 @check_rights('visit_logs', 'show_statistics_page')
 def download_users_visits():
     try:
-        buffer, filename = visit_log_repository.export_table('users_visits')
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='text/csv'
-        )
+        rows, filename = visit_log_repository.export_table('users_visits', **date_range())
+        return csv_response(rows, filename)
     except Exception as e:
         flash(f"Error generating CSV: {str(e)}", 'danger')
         return redirect(url_for('visit_logs.users_visits'))
+
+@bp.route('/analytics')
+@login_required
+@check_rights('visit_logs', 'show_statistics_page')
+def analytics():
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify(error=f"Unknown granularity '{granularity}'. Available: {list(GRANULARITIES)}"), 400
+    period = date_range()
+    date_to = period['date_to'] or date.today()
+    date_from = period['date_from'] or date_to - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if date_from > date_to:
+        return jsonify(error='date_from must not be later than date_to'), 400
+    if (date_to - date_from + timedelta(days=1)) / GRANULARITIES[granularity] > ANALYTICS_MAX_BUCKETS:
+        return jsonify(error=f'Too many buckets, the limit is {ANALYTICS_MAX_BUCKETS}'), 400
+
+    timeline = visit_log_repository.get_visits_timeline(
+        granularity, date_from, date_to,
+        path_prefix=request.args.get('path_prefix') or None,
+        user_id=request.args.get('user_id', type=int)
+    )
+    return jsonify(
+        granularity=granularity,
+        date_from=date_from.isoformat(),
+        date_to=date_to.isoformat(),
+        total=sum(visits for _, visits in timeline),
+        buckets=[{'start': start.isoformat(), 'visits': visits} for start, visits in timeline]
+    )
+
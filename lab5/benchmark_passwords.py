@@ -0,0 +1,68 @@
+# Замер пропускной способности входа: проверок пароля в секунду на ядро.
+#
+#   python benchmark_passwords.py --clients 32 --duration 5
+#   python benchmark_passwords.py --method scrypt:16384:8:1 --method pbkdf2:sha256:600000
+#
+# Каждый клиент в своём потоке в цикле проверяет пароль, как это делает вход.
+# Режим "inline" считает хэш прямо в потоке клиента (как раньше), режим "pool"
+# пропускает проверки через PasswordHasher с PASSWORD_HASH_WORKERS потоками.
+import argparse
+import os
+import threading
+import time
+
+from flask import Flask
+from werkzeug.security import generate_password_hash
+
+from app.passwords import PasswordHasher, DEFAULT_METHOD
+
+PASSWORD = 'Qwerty123'
+
+def make_hasher(method, workers):
+    app = Flask(__name__)
+    app.config.update(PASSWORD_HASH_METHOD=method, PASSWORD_HASH_WORKERS=workers,
+                      PASSWORD_HASH_QUEUE_SIZE=1024)
+    return PasswordHasher(app)
+
+def run(hasher, password_hash, clients, duration):
+    latencies = [[] for _ in range(clients)]
+    deadline = time.perf_counter() + duration
+
+    def client(results):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            assert hasher.verify(password_hash, PASSWORD)
+            results.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(results,)) for results in latencies]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    samples = sorted(latency for results in latencies for latency in results)
+    p95 = samples[int(len(samples) * 0.95) - 1] if samples else 0
+    return len(samples) / elapsed, p95
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер пропускной способности проверки паролей')
+    parser.add_argument('--method', action='append', help=f'Метод werkzeug (по умолчанию {DEFAULT_METHOD})')
+    parser.add_argument('--clients', type=int, default=16, help='Одновременных входов')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Потоков в пуле')
+    parser.add_argument('--duration', type=float, default=3.0, help='Секунд на каждый замер')
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    print(f'Ядер: {cores}, клиентов: {args.clients}, потоков в пуле: {args.workers}')
+    print(f"{'Метод':<26}{'Режим':<8}{'входов/с':>12}{'на ядро':>12}{'p95, мс':>12}")
+    for method in args.method or [DEFAULT_METHOD]:
+        password_hash = generate_password_hash(PASSWORD, method)
+        for mode, workers in (('inline', 0), ('pool', args.workers)):
+            hasher = make_hasher(method, workers)
+            throughput, p95 = run(hasher, password_hash, args.clients, args.duration)
+            hasher.shutdown()
+            print(f'{method:<26}{mode:<8}{throughput:>12.1f}{throughput / cores:>12.1f}{p95 * 1000:>12.2f}')
+
+if __name__ == '__main__':
+    main()
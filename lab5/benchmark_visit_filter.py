@@ -0,0 +1,66 @@
+# Замер накладных расходов фильтра журнала посещений на один запрос.
+#
+#   python benchmark_visit_filter.py --number 200000
+#
+# Сравнивается прежняя проверка (поиск эндпоинта в списке и re.search по каждому
+# шаблону, список которых строился заново на каждый запрос) и VisitPathFilter.
+import argparse
+import re
+import timeit
+
+from app.visit_filter import VisitPathFilter, DEFAULT_EXCLUDED_PATH_PATTERNS
+
+ENDPOINTS = [
+    'static', 'index', 'auth.login', 'auth.logout', 'auth.change_password',
+    'users.index', 'users.show', 'users.create', 'users.edit', 'users.delete',
+    'visit_logs.index', 'visit_logs.pages_visits', 'visit_logs.users_visits',
+    'visit_logs.download_pages_visits', 'visit_logs.download_users_visits',
+]
+
+REQUESTS = [
+    ('index', '/'),
+    ('users.index', '/users/'),
+    ('users.show', '/users/15'),
+    ('users.edit', '/users/15/edit'),
+    ('visit_logs.index', '/visit_logs/'),
+    ('visit_logs.pages_visits', '/visit_logs/pages_visits'),
+    ('static', '/static/styles.css'),
+    ('auth.logout', '/auth/logout'),
+    (None, '/favicon.ico'),
+]
+
+def legacy_should_log(endpoint, path):
+    if endpoint not in ENDPOINTS:
+        return False
+    excluded_patterns = [
+        r'^/static/',
+        r'/delete$',
+        r'/logout$',
+        r'\.ico$',
+        r'\.css$',
+        r'\.js$',
+        r'\.png$|\.jpg$|\.gif$'
+    ]
+    for pattern in excluded_patterns:
+        if re.search(pattern, path):
+            return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер фильтра журнала посещений')
+    parser.add_argument('--number', type=int, default=100_000, help='Количество проверок каждого пути')
+    args = parser.parse_args()
+
+    visit_filter = VisitPathFilter(ENDPOINTS, DEFAULT_EXCLUDED_PATH_PATTERNS)
+    for endpoint, path in REQUESTS:
+        assert legacy_should_log(endpoint, path) == visit_filter.should_log(endpoint, path), path
+
+    checks = {'прежняя проверка': legacy_should_log, 'VisitPathFilter': visit_filter.should_log}
+    print(f"{'Проверка':<20}{'мкс на запрос':>16}")
+    for name, check in checks.items():
+        elapsed = timeit.timeit(lambda: [check(endpoint, path) for endpoint, path in REQUESTS],
+                                number=args.number)
+        print(f'{name:<20}{elapsed / (args.number * len(REQUESTS)) * 1e6:>16.3f}')
+
+if __name__ == '__main__':
+    main()
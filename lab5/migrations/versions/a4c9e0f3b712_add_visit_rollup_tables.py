@@ -0,0 +1,47 @@
+"""Add daily visit rollup tables
+
+Revision ID: a4c9e0f3b712
+Revises: 713cd9b53737
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c9e0f3b712'
+down_revision = '713cd9b53737'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('page_visits_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('path', sa.String(length=100), nullable=False),
+    sa.Column('visit_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'path', name=op.f('pk_page_visits_daily'))
+    )
+    op.create_table('user_visits_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('visit_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'user_id', name=op.f('pk_user_visits_daily'))
+    )
+    # Заполнение агрегатов по уже накопленному журналу
+    op.execute(
+        'INSERT INTO page_visits_daily (day, path, visit_count) '
+        'SELECT DATE(created_at), path, COUNT(*) FROM visit_logs '
+        'GROUP BY DATE(created_at), path'
+    )
+    op.execute(
+        'INSERT INTO user_visits_daily (day, user_id, visit_count) '
+        'SELECT DATE(created_at), COALESCE(user_id, 0), COUNT(*) FROM visit_logs '
+        'GROUP BY DATE(created_at), COALESCE(user_id, 0)'
+    )
+
+
+def downgrade():
+    op.drop_table('user_visits_daily')
+    op.drop_table('page_visits_daily')
@@ -0,0 +1,28 @@
+"""Add visit_logs listing indexes
+
+Revision ID: c2e81f5d9a36
+Revises: a4c9e0f3b712
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e81f5d9a36'
+down_revision = 'a4c9e0f3b712'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_visit_logs_created_at_user_id_id', 'visit_logs',
+                    [sa.text('created_at DESC'), 'user_id', sa.text('id DESC')])
+    op.create_index('ix_visit_logs_user_id_created_at_id', 'visit_logs',
+                    ['user_id', sa.text('created_at DESC'), sa.text('id DESC')])
+
+
+def downgrade():
+    op.drop_index('ix_visit_logs_user_id_created_at_id', table_name='visit_logs')
+    op.drop_index('ix_visit_logs_created_at_user_id_id', table_name='visit_logs')
@@ -1,9 +1,21 @@
+import os
+import sys
+
+# Общий пакет common лежит в корне репозитория. При запуске из каталога
+# приложения (flask --app app ..., скрипты, тесты) корня в sys.path нет;
+# добавляется в конец, чтобы корневой app.py не заслонил этот пакет app
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
 from flask import Flask
 from flask_migrate import Migrate
 from flask_login import current_user
 from sqlalchemy.exc import SQLAlchemyError
 
 from .models import db
+from .passwords import hasher
+from .ratelimit import login_throttle
 from .auth import bp as auth_bp, init_login_manager
 from .courses import bp as courses_bp
 from .routes import bp as main_bp
@@ -21,6 +33,8 @@ def create_app(test_config=None):
         app.config.from_mapping(test_config)
 
     db.init_app(app)
+    hasher.init_app(app)
+    login_throttle.init_app(app)
     migrate = Migrate(app, db)
 
     init_login_manager(app)
@@ -3,6 +3,8 @@ from flask_login import LoginManager, login_user, logout_user, login_required, c
 
 from .models import db
 from .repositories import UserRepository
+from .passwords import HasherBusyError
+from .ratelimit import login_throttle
 
 user_repository = UserRepository(db)
 
@@ -24,9 +26,21 @@ def login():
     if request.method == 'POST':
         login = request.form.get('login')
         password = request.form.get('password')
+        retry_after = login_throttle.hit(request.remote_addr, login)
+        if retry_after:
+            flash(f'Слишком много попыток входа, повторите через {retry_after} с.', 'danger')
+            return render_template('auth/login.html'), 429, {'Retry-After': str(retry_after)}
         if login and password:
             user = user_repository.get_user_by_login(login)
-            if user and user.check_password(password):
+            try:
+                is_valid = user is not None and user.check_password(password)
+            except HasherBusyError:
+                flash('Сервер перегружен, попробуйте войти позже.', 'danger')
+                return render_template('auth/login.html'), 503
+            if is_valid:
+                login_throttle.reset(login)
+                # check_password мог обновить устаревший хэш пароля
+                db.session.commit()
                 login_user(user)
                 flash('Вы успешно аутентифицированы.', 'success')
                 next = request.args.get('next')
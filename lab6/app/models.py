@@ -3,7 +3,6 @@ from typing import Optional
 from datetime import datetime
 from click import DateTime
 import sqlalchemy as sa
-from werkzeug.security import check_password_hash, generate_password_hash
 from flask_login import UserMixin
 from flask import url_for
 from flask_sqlalchemy import SQLAlchemy
@@ -11,6 +10,8 @@ from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy import String, ForeignKey, Text, Integer, MetaData
 
+from .passwords import hasher
+
 
 class Base(DeclarativeBase):
   metadata = MetaData(naming_convention={
@@ -46,10 +47,14 @@ class User(Base, UserMixin):
     created_at: Mapped[datetime] = mapped_column(default=datetime.now)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # Устаревший хэш заменяется новым, сохранить его должен вызывающий код
+        is_valid, new_hash = hasher.verify_and_update(self.password_hash, password)
+        if new_hash is not None:
+            self.password_hash = new_hash
+        return is_valid
 
     @property
     def full_name(self):
@@ -0,0 +1,4 @@
+from common.passwords import DEFAULT_METHOD, HasherBusyError, PasswordHasher
+
+# Свой экземпляр: настройки задаются в create_app через hasher.init_app
+hasher = PasswordHasher()
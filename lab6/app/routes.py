@@ -1,6 +1,7 @@
-from flask import Blueprint, render_template, send_from_directory, current_app, abort
+from flask import Blueprint, render_template, send_from_directory, current_app, abort, request
 from .repositories import CategoryRepository, ImageRepository
 from .models import db
+from common.images import send_image, send_thumbnail
 
 category_repository = CategoryRepository(db)
 image_repository = ImageRepository(db)
@@ -18,7 +19,18 @@ def index():
 @bp.route('/images/<image_id>')
 def image(image_id):
     img = image_repository.get_by_id(image_id)
-    if image is None:
+    if img is None:
         abort(404)
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'],
-                               img.storage_filename)
+    return send_image(current_app.config['UPLOAD_FOLDER'],
+                      img.storage_filename, etag=img.md5_hash)
+
+@bp.route('/images/<image_id>/thumbnail')
+def thumbnail(image_id):
+    img = image_repository.get_by_id(image_id)
+    if img is None:
+        abort(404)
+    return send_thumbnail(current_app.config['UPLOAD_FOLDER'],
+                          img.storage_filename, etag=img.md5_hash,
+                          width=request.args.get('w', type=int),
+                          height=request.args.get('h', type=int),
+                          fmt=request.args.get('format', 'webp'))
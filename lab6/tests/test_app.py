@@ -350,4 +350,128 @@ def test_full_review_workflow(app, client):
         assert response.status_code == 200
         
         response = client.get(f'/courses/{course.id}/reviews')
-        assert response.status_code == 200
\ No newline at end of file
+        assert response.status_code == 200
+
+@pytest.fixture
+def stored_image(app):
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    image = Image(id='test-image-id', file_name='logo.png', mime_type='image/png', md5_hash='0123456789abcdef')
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], image.storage_filename), 'wb') as f:
+        f.write(b'0123456789' * 10)
+    db.session.add(image)
+    db.session.commit()
+    return image
+
+
+def test_image_has_long_lived_cache_headers(client, stored_image):
+    response = client.get('/images/test-image-id')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == '"0123456789abcdef"'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=31536000' in response.headers['Cache-Control']
+    assert 'Last-Modified' in response.headers
+
+
+def test_image_conditional_get_returns_not_modified(client, stored_image):
+    response = client.get('/images/test-image-id', headers={'If-None-Match': '"0123456789abcdef"'})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_image_range_request(client, stored_image):
+    response = client.get('/images/test-image-id', headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206
+    assert response.data == b'0123456789'
+
+
+def test_image_x_accel_redirect(app, client, stored_image):
+    app.config['IMAGE_X_ACCEL_PREFIX'] = '/protected-images/'
+    response = client.get('/images/test-image-id')
+    assert response.headers['X-Accel-Redirect'] == '/protected-images/test-image-id.png'
+    assert response.data == b''
+    assert client.get('/images/test-image-id', headers={'If-None-Match': '"0123456789abcdef"'}).status_code == 304
+
+
+def test_missing_image_returns_404(client):
+    assert client.get('/images/unknown').status_code == 404
+
+
+@pytest.fixture
+def stored_photo(app, tmp_path):
+    from PIL import Image as PILImage
+    app.config['THUMBNAIL_FOLDER'] = str(tmp_path / 'thumbnails')
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    image = Image(id='test-photo-id', file_name='photo.png', mime_type='image/png', md5_hash='fedcba9876543210')
+    PILImage.new('RGB', (1200, 800), 'red').save(os.path.join(app.config['UPLOAD_FOLDER'], image.storage_filename))
+    db.session.add(image)
+    db.session.commit()
+    return image
+
+
+def test_thumbnail_is_resized_and_cached(app, client, stored_photo):
+    from io import BytesIO
+    from PIL import Image as PILImage
+    response = client.get('/images/test-photo-id/thumbnail?w=340&h=340&format=jpeg')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert response.headers['ETag'] == '"fedcba9876543210-340x340-jpeg"'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert PILImage.open(BytesIO(response.data)).size == (340, 227)
+
+    cached = [files for _, _, files in os.walk(app.config['THUMBNAIL_FOLDER']) if files]
+    assert cached == [['fedcba9876543210-340x340.jpeg']]
+    assert client.get('/images/test-photo-id/thumbnail?w=340&h=340&format=jpeg').data == response.data
+
+
+def test_thumbnail_rejects_unknown_size_and_format(client, stored_photo):
+    assert client.get('/images/test-photo-id/thumbnail?w=341&h=340').status_code == 404
+    assert client.get('/images/test-photo-id/thumbnail?w=340&h=340&format=bmp').status_code == 404
+    assert client.get('/images/unknown/thumbnail?w=340&h=340').status_code == 404
+
+
+def test_thumbnail_cache_evicts_least_recently_used(app, client, stored_photo):
+    app.config['THUMBNAIL_CACHE_SIZE'] = 1
+    client.get('/images/test-photo-id/thumbnail?w=160&h=160&format=png')
+    assert client.get('/images/test-photo-id/thumbnail?w=340&h=340&format=png').status_code == 200
+    cached = [file for _, _, files in os.walk(app.config['THUMBNAIL_FOLDER']) for file in files]
+    assert cached == ['fedcba9876543210-340x340.png']
+
+
+def test_login_upgrades_outdated_hash_and_rejects_sha256(app, client):
+    import hashlib
+    from werkzeug.security import generate_password_hash
+    from app.passwords import hasher
+
+    # Несолёные SHA2 принимает только lab4: здесь их никогда не записывали
+    user = User(login='outdated', first_name='Тест', last_name='Пользователь',
+                password_hash=generate_password_hash('qwerty', 'pbkdf2:sha256:1000'))
+    legacy = User(login='legacy', first_name='Тест', last_name='Пользователь',
+                  password_hash=hashlib.sha256(b'qwerty').hexdigest())
+    db.session.add_all([user, legacy])
+    db.session.commit()
+
+    response = client.post('/auth/login', data={'login': 'outdated', 'password': 'qwerty'})
+    assert response.status_code == 302
+    db.session.refresh(user)
+    assert not hasher.needs_rehash(user.password_hash)
+    assert user.check_password('qwerty') and not user.check_password('wrong')
+
+    client.get('/auth/logout')
+    response = client.post('/auth/login', data={'login': 'legacy', 'password': 'qwerty'})
+    assert response.status_code == 200
+    assert not legacy.check_password('qwerty')
+
+def test_login_throttled_by_ip(app, client, mocker):
+    from app.ratelimit import login_throttle
+
+    app.config.update(LOGIN_THROTTLE_IP_CAPACITY=3)
+    login_throttle.init_app(app)
+    for number in range(3):
+        response = client.post('/auth/login', data={'login': f'user{number}', 'password': 'wrong'})
+        assert response.status_code == 200
+
+    get_user_by_login = mocker.patch('app.auth.user_repository.get_user_by_login')
+    response = client.post('/auth/login', data={'login': 'user9', 'password': 'wrong'})
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+    get_user_by_login.assert_not_called()